@@ -5,21 +5,30 @@ Google OAuth2 로그인 + Gmail API 발송
 
 import streamlit as st
 import pandas as pd
+import base64
+import logging
 import time
 import threading
+import queue
 import io as _io
 
 from send_history import (
-    add_sent_emails_batch,
+    SendHistorySession,
     get_sent_emails,
-    get_sent_count,
-    get_today_sent_count,
+    fetch_history,
     clear_history,
     verify_sheets_access,
 )
 
-from excel_parser import read_excel, get_column_names, analyze_data, get_row_data
-from template_engine import extract_variables, render_email, get_empty_variables
+from excel_parser import (
+    read_excel_cached,
+    get_column_names,
+    analyze_data_cached,
+    get_file_key,
+    get_records_cached,
+    get_valid_email_indices,
+)
+from template_engine import extract_variables, get_empty_variables, render_email_batch
 from google_auth import (
     check_secrets_configured,
     get_authorization_url,
@@ -27,11 +36,15 @@ from google_auth import (
     get_user_info,
     credentials_to_dict,
     credentials_from_dict,
+    refresh_if_expired,
     get_gmail_service,
     get_gmail_signature,
     send_email,
+    prepare_attachments,
 )
 
+log = logging.getLogger(__name__)
+
 # ─────────────────────────────────────────────────────────
 # 페이지 설정
 # ─────────────────────────────────────────────────────────
@@ -44,7 +57,18 @@ st.set_page_config(
 # ─────────────────────────────────────────────────────────
 # 커스텀 CSS
 # ─────────────────────────────────────────────────────────
-st.markdown("""
+# Google 로고 SVG (로그인 버튼 ::before 배경으로 사용)
+GOOGLE_LOGO_SVG = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="18" height="18" viewBox="0 0 48 48">'
+    '<path fill="#EA4335" d="M24 9.5c3.54 0 6.71 1.22 9.21 3.6l6.85-6.85C35.9 2.38 30.47 0 24 0 14.62 0 6.51 5.38 2.56 13.22l7.98 6.19C12.43 13.72 17.74 9.5 24 9.5z"/>'
+    '<path fill="#4285F4" d="M46.98 24.55c0-1.57-.15-3.09-.38-4.55H24v9.02h12.94c-.58 2.96-2.26 5.48-4.78 7.18l7.73 6c4.51-4.18 7.09-10.36 7.09-17.65z"/>'
+    '<path fill="#FBBC05" d="M10.53 28.59c-.48-1.45-.76-2.99-.76-4.59s.27-3.14.76-4.59l-7.98-6.19C.92 16.46 0 20.12 0 24c0 3.88.92 7.54 2.56 10.78l7.97-6.19z"/>'
+    '<path fill="#34A853" d="M24 48c6.48 0 11.93-2.13 15.89-5.81l-7.73-6c-2.15 1.45-4.92 2.3-8.16 2.3-6.26 0-11.57-4.22-13.47-9.91l-7.98 6.19C6.51 42.62 14.62 48 24 48z"/>'
+    '</svg>'
+)
+GOOGLE_LOGO_URI = "data:image/svg+xml;base64," + base64.b64encode(GOOGLE_LOGO_SVG.encode("utf-8")).decode("ascii")
+
+CUSTOM_CSS = """
 <style>
     /* Google 로그인 버튼 (공식 스타일) */
     .google-btn {
@@ -75,6 +99,12 @@ st.markdown("""
     .google-btn:active {
         background-color: #e8eaed;
     }
+    .google-btn::before {
+        content: "";
+        width: 18px;
+        height: 18px;
+        background: url("__GOOGLE_LOGO_URI__") no-repeat center / contain;
+    }
 
     /* 로그인된 사용자 프로필 카드 */
     .user-profile-card {
@@ -144,7 +174,9 @@ st.markdown("""
         align-items: center;
     }
 </style>
-""", unsafe_allow_html=True)
+""".replace("__GOOGLE_LOGO_URI__", GOOGLE_LOGO_URI)
+
+st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
 
 # ─────────────────────────────────────────────────────────
 # 세션 상태 초기화
@@ -155,7 +187,9 @@ DEFAULT_STATE = {
     "google_credentials": None,
     "user_info": None,
     "gmail_sender_name": "",
-    "df": None,
+    "df_key": "",                     # 업로드 파일 해시 (공유 DataFrame 캐시 키)
+    "df": None,                       # 파싱한 DataFrame (공유 캐시와 같은 객체 — 캐시에서 밀려나도 세션에 남음)
+    "df_records": [],                 # 행별 {열이름: 값} 딕셔너리 (미리보기용)
     "subject_template": "",
     "body_template": "",
     "empty_handling": "defaults",
@@ -178,13 +212,44 @@ DEFAULT_STATE = {
     "user_oauth_config": None,        # 사용자가 직접 입력한 OAuth 설정
 }
 
+# 로그인 과정과 화면 캐시에서 추가로 생기는 세션 키 (로그아웃 시 함께 삭제)
+LOGIN_STATE_KEYS = [
+    "login_error", "oauth_state", "oauth_auth_url", "sheets_api_ok", "sheets_api_error",
+    "_sent_cache", "_sent_cache_at", "_signature_checked_at",
+    "_send_results_table", "_send_results_src", "_progress_tail", "_progress_tail_key",
+    "_used_vars", "_used_vars_key", "_upload_df_key", "_upload_file_id",
+]
+
+# key를 준 입력 위젯 (key가 있으면 value 인자보다 위젯 상태가 우선하므로 로그아웃 시 함께 삭제)
+WIDGET_STATE_KEYS = [
+    "subject_input", "body_input", "empty_handling_radio", "alt_subject_input", "alt_body_input",
+    "email_col_select", "preview_nav", "show_empty_summary", "daily_limit_input",
+]
+DEFAULT_INPUT_KEY_PREFIX = "default_"  # 변수별 기본값 입력 위젯 (default_{변수명})
+
+
+def _uploader_key(name: str) -> str:
+    """
+    파일 업로더 위젯 key. 업로더는 세션 상태를 지워도 올린 파일이 남으므로,
+    로그아웃 때마다 세대 번호(_uploader_gen)를 올려 새 위젯으로 바꾼다.
+    """
+    return f"{name}_{st.session_state.get('_uploader_gen', 0)}"
+
 for key, default_val in DEFAULT_STATE.items():
     if key not in st.session_state:
         st.session_state[key] = default_val
 
 # ── 일일 발송 카운터 날짜 리셋 ──
 import datetime
-_today = datetime.date.today().isoformat()
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _today_iso() -> str:
+    """오늘 날짜(YYYY-MM-DD)를 1분 단위로 캐시한다."""
+    return datetime.date.today().isoformat()
+
+
+_today = _today_iso()
 if st.session_state.daily_sent_date != _today:
     st.session_state.daily_sent_count = 0
     st.session_state.daily_sent_date = _today
@@ -197,39 +262,325 @@ def _get_remaining() -> int:
     return max(0, _get_daily_limit() - st.session_state.daily_sent_count)
 
 
+# ── 템플릿 변수 목록 (모든 탭 공용) ──
+def _get_used_vars() -> list[str]:
+    """현재 제목/본문 템플릿의 변수 목록을 반환한다. 템플릿이 바뀔 때만 다시 추출한다."""
+    tmpl_key = (st.session_state.subject_template, st.session_state.body_template)
+    if st.session_state.get("_used_vars_key") != tmpl_key:
+        st.session_state._used_vars = extract_variables(tmpl_key[0] + " " + tmpl_key[1])
+        st.session_state._used_vars_key = tmpl_key
+    return st.session_state._used_vars
+
+
+# ── 업로드 파일 해시 키 ──
+def _upload_file_key(file_id: str, raw: bytes) -> str:
+    """
+    업로드 파일의 내용 해시(df_key)를 반환한다.
+    같은 업로드(file_id)에 대해서는 rerun마다 파일 전체를 다시 해시하지 않는다.
+    """
+    ss = st.session_state
+    if ss.get("_upload_file_id") != file_id:
+        ss._upload_df_key = get_file_key(raw)
+        ss._upload_file_id = file_id
+    return ss._upload_df_key
+
+
+# ── 발송 이력 이메일 집합 (세션 캐시) ──
+SENT_CACHE_TTL = 300  # 초 (다른 세션/기기에서 보낸 이력 반영 주기)
+
+
+def _get_already_sent(creds) -> set[str]:
+    """
+    발송 이력 이메일 집합(소문자)을 세션에 보관해 재사용한다.
+    rerun마다 Sheets 전체를 다시 읽지 않고, TTL이 지났거나 무효화된 경우에만 새로 가져온다.
+    """
+    ss = st.session_state
+    if "_sent_cache" not in ss or time.time() - ss.get("_sent_cache_at", 0) > SENT_CACHE_TTL:
+        ss._sent_cache = get_sent_emails(creds)
+        ss._sent_cache_at = time.time()
+    return ss._sent_cache
+
+
+def _load_history(creds) -> int:
+    """
+    발송 이력 집합과 오늘 발송 건수를 한 번의 요청으로 가져온다.
+    집합은 세션 캐시에 넣어 두고, 오늘 발송 건수를 반환한다.
+    """
+    ss = st.session_state
+    ss._sent_cache, today_count = fetch_history(creds)
+    ss._sent_cache_at = time.time()
+    return today_count
+
+
+def _add_to_sent_cache(emails) -> None:
+    """방금 발송에 성공한 이메일을 세션 캐시에 바로 반영한다. (시트를 다시 읽지 않음)"""
+    cache = st.session_state.get("_sent_cache")
+    if cache is not None:
+        cache.update(e.strip().lower() for e in emails)
+
+
+def _invalidate_sent_cache() -> None:
+    """발송/이력 초기화로 시트 내용이 바뀌었을 때 세션의 발송 이력 캐시를 비운다."""
+    st.session_state.pop("_sent_cache", None)
+    st.session_state.pop("_sent_cache_at", None)
+
+
+# ── 업로드 DataFrame 조회 ──
+def _session_df() -> pd.DataFrame | None:
+    """세션에 업로드된 DataFrame. 업로드 전이면 None."""
+    return st.session_state.df
+
+
+# ── 유효 이메일 행 캐시 ──
+@st.cache_data(max_entries=16, show_spinner=False)
+def _valid_email_indices_cached(df_key: str, email_col: str, _emails: pd.Series) -> list[int]:
+    """(업로드 파일, 이메일 열)별로 유효 행 인덱스를 캐시한다. (미리보기 이동 시 재스캔 방지)"""
+    return get_valid_email_indices(_emails)
+
+
+# ── 데이터 미리보기 빈 셀 강조 스타일 캐시 ──
+EMPTY_CELL_STYLE = "background-color: #FFF3CD; color: #856404;"
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _empty_cell_styles(df_key: str, _head: pd.DataFrame) -> pd.DataFrame:
+    """미리보기 행의 빈 셀 스타일 표를 한 번에 계산한다. (셀마다 콜백 호출 방지)"""
+    is_empty = _head.isna() | _head.astype(str).apply(lambda col: col.str.strip()).eq("")
+    return pd.DataFrame("", index=_head.index, columns=_head.columns).mask(is_empty, EMPTY_CELL_STYLE)
+
+
+# ── 이메일 열 자동 추측 캐시 ──
+@st.cache_data(max_entries=16, show_spinner=False)
+def _guess_email_column_idx(columns: tuple[str, ...]) -> int:
+    """열 이름으로 이메일 열 위치를 추측한다. 일치하는 열이 없으면 0."""
+    matches = pd.Index(columns).str.lower().str.contains("email|이메일|메일|mail", regex=True)
+    return int(matches.argmax()) if matches.any() else 0
+
+
+# ── 첨부 파일 요약 캐시 ──
+ATTACHMENT_LIMIT_MB = 25
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _attachment_summary(sig: tuple[tuple[str, int], ...]) -> tuple[float, str, int]:
+    """
+    첨부 파일 (이름, 크기) 목록별로 요약을 캐시한다.
+
+    Returns:
+        (총 크기 MB, 파일 목록 마크다운, 총 바이트) - 한도 초과 시 파일 목록은 빈 문자열
+    """
+    total_bytes = sum(size for _, size in sig)
+    size_mb = total_bytes / (1024 * 1024)
+    if size_mb > ATTACHMENT_LIMIT_MB:
+        return size_mb, "", total_bytes
+    file_info = ", ".join(f"**{name}** ({size / 1024:.0f}KB)" for name, size in sig)
+    return size_mb, file_info, total_bytes
+
+
+def _attachment_sig(files) -> tuple[tuple[str, int], ...]:
+    """첨부 파일 목록의 캐시 키 (이름, 크기) 튜플을 만든다."""
+    return tuple((f.name, f.size) for f in files)
+
+
+# ── 전체 수신자 메일 렌더링 캐시 ──
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _render_all(
+    subject_t: str,
+    body_t: str,
+    df_key: str,
+    mapping: tuple[tuple[str, str], ...],
+    defaults: tuple[tuple[str, str], ...],
+    alt_sub: str | None,
+    alt_bod: str | None,
+    _df: pd.DataFrame,
+) -> list[dict]:
+    """
+    모든 행의 최종 제목/본문을 한 번에 렌더링해 캐시한다.
+    (템플릿, 매핑, 업로드 데이터) 조합이 같으면 미리보기 이동과 발송 준비에서 재사용한다.
+
+    사용 변수 열만 문자열로 한 번에 정리한 뒤 render_email_batch로 치환한다.
+
+    Returns:
+        행 순서대로 [{"subject", "body", "used_alt", "empty_vars"}, ...]
+    """
+    used_vars = extract_variables(subject_t + " " + body_t)
+    col_mapping = dict(mapping)
+
+    # 사용 변수 열만 골라 문자열 프레임으로 정리 (NaN → "", 앞뒤 공백 제거)
+    columns = {}
+    for var in used_vars:
+        col = col_mapping.get(var, var)
+        if col in _df.columns:
+            s = _df[col]
+            columns[var] = s.astype(object).where(s.notna(), "").astype(str).str.strip()
+        else:
+            columns[var] = ""
+    values = pd.DataFrame(columns, index=_df.index, columns=used_vars)
+
+    # 열이 없는 프레임은 itertuples가 행을 내지 않으므로 빈 딕셔너리로 채운다
+    if used_vars:
+        rows = [dict(zip(used_vars, row)) for row in values.itertuples(index=False, name=None)]
+    else:
+        rows = [{} for _ in range(len(values))]
+
+    rendered = render_email_batch(subject_t, body_t, rows, dict(defaults), alt_sub, alt_bod)
+    return [
+        {
+            "subject": r.subject,
+            "body": r.body,
+            "used_alt": r.used_alt,
+            "empty_vars": get_empty_variables(data, used_vars),
+        }
+        for data, r in zip(rows, rendered)
+    ]
+
+
 # ── 인증 헬퍼 (send_history 호출용) ──
 def _get_credentials():
-    """세션에 저장된 credentials를 복원한다. 로그인 안 된 경우 None."""
+    """
+    세션에 저장된 credentials를 복원한다. 로그인 안 된 경우 None.
+    토큰이 만료됐을 때만 갱신하고, 갱신한 토큰은 세션에 다시 저장해 rerun마다 갱신하지 않는다.
+    """
     cred_dict = st.session_state.get("google_credentials")
-    if cred_dict:
-        return credentials_from_dict(cred_dict)
-    return None
+    if not cred_dict:
+        return None
+    credentials = credentials_from_dict(cred_dict)
+    try:
+        if refresh_if_expired(credentials):
+            st.session_state.google_credentials = credentials_to_dict(credentials)
+    except Exception:
+        pass  # 갱신 실패 시 기존처럼 API 호출 시점의 자동 갱신에 맡김
+    return credentials
+
+
+# ── OAuth 설정/인증 URL 헬퍼 ──
+def _set_user_oauth_config(config: dict | None) -> None:
+    """사용자 OAuth 설정을 바꾸고, 이전 설정으로 만든 인증 URL 캐시를 비운다."""
+    st.session_state.user_oauth_config = config
+    st.session_state.pop("oauth_auth_url", None)
+    st.session_state.pop("oauth_state", None)
+
+
+def _get_cached_authorization_url() -> str:
+    """세션당 한 번만 OAuth 인증 URL과 state를 생성해 재사용한다."""
+    if "oauth_auth_url" not in st.session_state:
+        auth_url, state = get_authorization_url()
+        st.session_state.oauth_auth_url = auth_url
+        st.session_state.oauth_state = state
+    return st.session_state.oauth_auth_url
+
+
+# ── Gmail 서명 ──
+SIGNATURE_RECHECK_SEC = 3600  # 서명이 비어 있을 때 다시 조회하는 간격 (초)
+
+
+def _fetch_gmail_signature(email: str, cred_dict: dict) -> str:
+    """
+    Gmail 서명을 가져온다. 결과는 세션에 보관하고, 비어 있으면 SIGNATURE_RECHECK_SEC마다 다시 조회한다.
+    로그인 콜백에서 조회하지 않고 서명이 처음 필요할 때 가져온다.
+    """
+    try:
+        gmail_svc = get_gmail_service(credentials_from_dict(cred_dict))
+        return get_gmail_signature(gmail_svc, email)
+    except Exception:
+        return ""
 
 
 # ── 백그라운드 메일 발송 ──
+# ── 발송 결과 행 형식 ──
+# 결과는 행마다 dict 대신 이 열 순서의 튜플로 쌓고, 표로 만들 때 열 이름을 붙인다
+RESULT_COLUMNS = ["시간", "수신자", "상태", "메모"]
+
+
+# ── 발송 이력 기록 스레드 ──
+HISTORY_FLUSH_INTERVAL = 10   # 초 (첫 이메일이 들어온 뒤 이 시간 안에 기록)
+HISTORY_BATCH_MAX = 50        # 한 번에 기록할 최대 건수
+_HISTORY_STOP = object()
+
+
+def _history_writer(credentials_dict, history_q: queue.Queue, progress: dict) -> None:
+    """
+    발송 성공 이메일을 큐에서 모아 Sheets 이력에 묶어서 기록한다.
+    발송 루프는 큐에 넣기만 하므로 이력 API 호출을 기다리지 않는다.
+    기록에 실패한 묶음은 다음 묶음과 합쳐 이력 세션을 다시 열어 재시도한다.
+    _HISTORY_STOP을 받으면 남은 이메일을 기록하고 종료하며,
+    끝내 기록하지 못한 이메일은 progress["history_unsaved"]에 남긴다.
+    """
+    history = None  # 첫 기록 때 연다 (성공 발송이 없으면 API 호출 없음)
+    unsaved: list[str] = []  # 기록에 실패해 다시 시도할 이메일
+    stop = False
+    while not stop:
+        item = history_q.get()
+        batch = []
+        if item is _HISTORY_STOP:
+            stop = True
+        else:
+            batch.append(item)
+            deadline = time.monotonic() + HISTORY_FLUSH_INTERVAL
+            while len(batch) < HISTORY_BATCH_MAX:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = history_q.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _HISTORY_STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+        batch = unsaved + batch
+        if not batch:
+            continue
+        try:
+            if history is None:
+                history = SendHistorySession(credentials_from_dict(credentials_dict)).open()
+            ok, message = history.append(batch)
+        except Exception as e:
+            ok, message = False, f"이력 저장 실패: {e}"
+        if ok:
+            unsaved = []
+            progress["history_error"] = None
+        else:
+            log.warning("발송 이력 %d건 기록 실패 (다음 묶음과 함께 재시도): %s", len(batch), message)
+            unsaved = batch
+            history = None  # 시트 ID·서비스를 다시 확인하도록 세션을 새로 연다
+            progress["history_error"] = message
+
+    if unsaved:
+        log.error("발송 이력 %d건을 끝내 기록하지 못했습니다: %s", len(unsaved), ", ".join(unsaved))
+    progress["history_unsaved"] = unsaved
+
+
 def _background_send(
     credentials_dict, email_list, sender_email, sender_name,
     sig_html, attachment_data, delay, daily_limit, initial_daily_sent, progress,
 ):
     """백그라운드 스레드에서 메일을 순차 발송한다. Streamlit 재실행과 무관하게 동작."""
+    history_q = queue.Queue()
+    history_thread = threading.Thread(
+        target=_history_writer, args=(credentials_dict, history_q, progress), daemon=True,
+    )
+    history_thread.start()
+
     try:
         credentials = credentials_from_dict(credentials_dict)
         gmail_service = get_gmail_service(credentials)
 
-        fake_attachments = None
-        if attachment_data:
-            fake_attachments = []
-            for att in attachment_data:
-                f = _io.BytesIO(att["data"])
-                f.name = att["name"]
-                fake_attachments.append(f)
+        # 첨부 파일은 한 번만 인코딩해 모든 수신자에게 같은 MIME 파트를 붙인다
+        fake_attachments = []
+        for att in attachment_data or []:
+            f = _io.BytesIO(att["data"])
+            f.name = att["name"]
+            fake_attachments.append(f)
+        attachment_parts = prepare_attachments(fake_attachments)
 
         results = progress["results"]
         total = progress["total"]
         success_count = 0
         fail_count = 0
         skipped_count = 0
-        sent_batch = []
         current_daily = initial_daily_sent
 
         for i, ed in enumerate(email_list):
@@ -237,70 +588,44 @@ def _background_send(
                 break
 
             if current_daily >= daily_limit:
-                for rd in email_list[i:]:
-                    results.append({
-                        "시간": time.strftime("%H:%M:%S"),
-                        "수신자": rd["to"],
-                        "상태": "⏸️ 한도초과",
-                        "메모": f"일일 한도 {daily_limit}건 도달",
-                    })
-                    skipped_count += 1
+                now = time.strftime("%H:%M:%S")
+                limit_note = f"일일 한도 {daily_limit}건 도달"
+                results.extend((now, rd["to"], "⏸️ 한도초과", limit_note) for rd in email_list[i:])
+                skipped_count += total - i
                 break
 
             # 100건마다 서비스 재생성 (연결 안정성 + 토큰 갱신)
             if i > 0 and i % 100 == 0:
                 try:
                     credentials = credentials_from_dict(credentials_dict)
-                    gmail_service = get_gmail_service(credentials)
+                    gmail_service = get_gmail_service(credentials, cached=False)
                 except Exception:
                     pass
 
-            # 재시도 로직 (최대 3회, 지수 백오프)
-            success, message = False, ""
-            for attempt in range(3):
-                if fake_attachments:
-                    for f in fake_attachments:
-                        f.seek(0)
-                success, message = send_email(
-                    service=gmail_service,
-                    to_email=ed["to"],
-                    subject=ed["subject"],
-                    body=ed["body"],
-                    from_email=sender_email,
-                    from_name=sender_name,
-                    signature_html=sig_html,
-                    attachments=fake_attachments,
-                )
-                if success:
-                    break
-                if any(k in message for k in ("429", "한도 초과", "500", "503", "502")):
-                    time.sleep(2 ** (attempt + 1))
-                    try:
-                        credentials = credentials_from_dict(credentials_dict)
-                        gmail_service = get_gmail_service(credentials)
-                    except Exception:
-                        pass
-                    continue
-                break
+            # 속도 제한 거절(429, 403 rateLimitExceeded) 재시도는 send_email 안에서 지수 백오프 + 지터로 처리
+            # (5xx·타임아웃은 Gmail이 이미 받았을 수 있어 재시도하지 않고 실패로 남긴다 — 이력에 없으므로 다시 발송 가능)
+            success, message = send_email(
+                service=gmail_service,
+                to_email=ed["to"],
+                subject=ed["subject"],
+                body=ed["body"],
+                from_email=sender_email,
+                from_name=sender_name,
+                signature_html=sig_html,
+                attachment_parts=attachment_parts,
+            )
 
-            results.append({
-                "시간": time.strftime("%H:%M:%S"),
-                "수신자": ed["to"],
-                "상태": "✅ 성공" if success else "❌ 실패",
-                "메모": ed.get("note", "") if success else message,
-            })
+            results.append((
+                time.strftime("%H:%M:%S"),
+                ed["to"],
+                "✅ 성공" if success else "❌ 실패",
+                ed.get("note", "") if success else message,
+            ))
 
             if success:
                 success_count += 1
                 current_daily += 1
-                sent_batch.append(ed["to"])
-                if len(sent_batch) >= 50:
-                    try:
-                        c = credentials_from_dict(credentials_dict)
-                        add_sent_emails_batch(c, sent_batch)
-                    except Exception:
-                        pass
-                    sent_batch = []
+                history_q.put(ed["to"])
             else:
                 fail_count += 1
 
@@ -313,19 +638,30 @@ def _background_send(
             if i < total - 1 and not progress.get("cancel"):
                 time.sleep(delay)
 
-        if sent_batch:
-            try:
-                c = credentials_from_dict(credentials_dict)
-                add_sent_emails_batch(c, sent_batch)
-            except Exception:
-                pass
-
     except Exception as e:
         progress["error"] = str(e)
 
+    # 남은 이력을 기록한 뒤 완료 처리 (완료 화면의 이력 조회에 반영되도록)
+    history_q.put(_HISTORY_STOP)
+    history_thread.join(timeout=30)
+
     progress["done"] = True
 
 
+def _send_results_table() -> tuple[pd.DataFrame, bytes]:
+    """
+    발송 결과 표와 CSV 바이트를 반환한다.
+    결과 목록이 바뀔 때만 새로 만들고, 결과 화면의 rerun에서는 재사용한다.
+    """
+    ss = st.session_state
+    results = ss.send_results
+    if ss.get("_send_results_src") is not results:
+        results_df = pd.DataFrame(results, columns=RESULT_COLUMNS)
+        ss._send_results_table = (results_df, results_df.to_csv(index=False).encode("utf-8-sig"))
+        ss._send_results_src = results
+    return ss._send_results_table
+
+
 @st.fragment(run_every=2)
 def _show_send_progress():
     """발송 진행 상황을 2초마다 자동 갱신하는 프래그먼트."""
@@ -349,16 +685,24 @@ def _show_send_progress():
         f"📊 잔여 한도: {daily_left}건"
     )
 
+    if progress.get("history_error") and not progress.get("done"):
+        st.warning(f"⚠️ 발송 이력 저장이 지연되고 있습니다 (자동 재시도 중): {progress['history_error']}")
+
     results = progress.get("results", [])
     if results:
-        show = results[-50:] if len(results) > 50 else results
-        st.dataframe(pd.DataFrame(show), use_container_width=True)
+        # 2초마다 다시 그리지만, 새 결과가 없으면 직전 표를 재사용
+        tail_key = (id(results), len(results))
+        if st.session_state.get("_progress_tail_key") != tail_key:
+            st.session_state._progress_tail = pd.DataFrame(results[-50:], columns=RESULT_COLUMNS)
+            st.session_state._progress_tail_key = tail_key
+        st.dataframe(st.session_state._progress_tail, use_container_width=True)
         if len(results) > 50:
             st.caption(f"최근 50건 표시 중 (전체 {len(results)}건)")
 
     if progress.get("done"):
         st.session_state.send_thread_running = False
         st.session_state.sending_done = True
+        _add_to_sent_cache(r[1] for r in results if r[2] == "✅ 성공")
         st.session_state.send_results = results
         st.session_state.daily_sent_count = progress.get(
             "final_daily_count", st.session_state.daily_sent_count
@@ -374,7 +718,7 @@ def _show_send_progress():
             summary += f"  \n- ⏸️ 한도초과 스킵: {skipped}건"
         creds = _get_credentials()
         try:
-            _total_sent = get_sent_count(creds) if creds else "?"
+            _total_sent = len(_get_already_sent(creds)) if creds else "?"
         except Exception:
             _total_sent = "?"
         summary += f"  \n- 📋 총 발송 이력: {_total_sent}건"
@@ -420,14 +764,6 @@ if "code" in query_params and not st.session_state.gmail_connected:
         st.session_state.gmail_email = user_info.get("email", "")
         st.session_state.gmail_sender_name = user_info.get("name", "")
 
-        # Gmail 서명 자동 가져오기
-        try:
-            gmail_svc = get_gmail_service(credentials)
-            sig = get_gmail_signature(gmail_svc, user_info.get("email", ""))
-            st.session_state.gmail_signature = sig
-        except Exception:
-            st.session_state.gmail_signature = ""
-
         # Sheets/Drive API 접근 검증 + 오늘 발송 건수 복원
         try:
             sheets_ok, sheets_msg = verify_sheets_access(credentials)
@@ -437,7 +773,7 @@ if "code" in query_params and not st.session_state.gmail_connected:
             else:
                 st.session_state.sheets_api_error = ""
                 # 오늘 발송 건수를 Google Sheets에서 복원
-                today_count = get_today_sent_count(credentials)
+                today_count = _load_history(credentials)
                 if today_count > st.session_state.daily_sent_count:
                     st.session_state.daily_sent_count = today_count
         except Exception as e:
@@ -554,11 +890,11 @@ with st.sidebar:
                     if not input_client_id or not input_client_secret:
                         st.error("Client ID와 Client Secret을 모두 입력해주세요.")
                     else:
-                        st.session_state.user_oauth_config = {
+                        _set_user_oauth_config({
                             "client_id": input_client_id.strip(),
                             "client_secret": input_client_secret.strip(),
                             "redirect_uri": input_redirect_uri.strip(),
-                        }
+                        })
                         st.rerun()
 
         else:
@@ -567,8 +903,7 @@ with st.sidebar:
             current_config = _get_oauth_config()
 
             try:
-                auth_url, state = get_authorization_url()
-                st.session_state.oauth_state = state
+                auth_url = _get_cached_authorization_url()
 
                 # ── 현재 설정 확인 (항상 표시) ──
                 if current_config:
@@ -592,17 +927,7 @@ with st.sidebar:
 
                 # 공식 Google 로그인 버튼 스타일
                 st.markdown(
-                    f"""
-                    <a href="{auth_url}" target="_blank" class="google-btn">
-                        <svg width="18" height="18" viewBox="0 0 48 48">
-                            <path fill="#EA4335" d="M24 9.5c3.54 0 6.71 1.22 9.21 3.6l6.85-6.85C35.9 2.38 30.47 0 24 0 14.62 0 6.51 5.38 2.56 13.22l7.98 6.19C12.43 13.72 17.74 9.5 24 9.5z"/>
-                            <path fill="#4285F4" d="M46.98 24.55c0-1.57-.15-3.09-.38-4.55H24v9.02h12.94c-.58 2.96-2.26 5.48-4.78 7.18l7.73 6c4.51-4.18 7.09-10.36 7.09-17.65z"/>
-                            <path fill="#FBBC05" d="M10.53 28.59c-.48-1.45-.76-2.99-.76-4.59s.27-3.14.76-4.59l-7.98-6.19C.92 16.46 0 20.12 0 24c0 3.88.92 7.54 2.56 10.78l7.97-6.19z"/>
-                            <path fill="#34A853" d="M24 48c6.48 0 11.93-2.13 15.89-5.81l-7.73-6c-2.15 1.45-4.92 2.3-8.16 2.3-6.26 0-11.57-4.22-13.47-9.91l-7.98 6.19C6.51 42.62 14.62 48 24 48z"/>
-                        </svg>
-                        Google로 로그인
-                    </a>
-                    """,
+                    f'<a href="{auth_url}" target="_blank" class="google-btn">Google로 로그인</a>',
                     unsafe_allow_html=True,
                 )
                 st.markdown("<br>", unsafe_allow_html=True)
@@ -662,7 +987,7 @@ with st.sidebar:
                 st.info("💡 입력한 Client ID / Client Secret이 올바른지 확인해주세요.")
                 # 설정 초기화 버튼
                 if st.button("🔄 설정 다시 입력", use_container_width=True):
-                    st.session_state.user_oauth_config = None
+                    _set_user_oauth_config(None)
                     st.rerun()
 
             # ── 사용자 직접 API 연결 / 기본 API로 전환 ──
@@ -671,7 +996,7 @@ with st.sidebar:
                 # 현재 사용자 직접 입력 API 사용 중
                 st.caption("🔧 현재 **직접 입력한 API**로 연결 중")
                 if st.button("🔙 기본 API로 돌아가기", use_container_width=True, type="secondary"):
-                    st.session_state.user_oauth_config = None
+                    _set_user_oauth_config(None)
                     st.rerun()
             else:
                 # 기본 API (앱 소유자 secrets) 사용 중
@@ -716,11 +1041,11 @@ with st.sidebar:
                             if not custom_client_id or not custom_client_secret:
                                 st.error("Client ID와 Client Secret을 모두 입력해주세요.")
                             else:
-                                st.session_state.user_oauth_config = {
+                                _set_user_oauth_config({
                                     "client_id": custom_client_id.strip(),
                                     "client_secret": custom_client_secret.strip(),
                                     "redirect_uri": custom_redirect_uri.strip(),
-                                }
+                                })
                                 st.rerun()
 
         # 로그인 에러 표시
@@ -748,18 +1073,29 @@ with st.sidebar:
         """, unsafe_allow_html=True)
 
         if st.button("로그아웃", use_container_width=True, type="secondary"):
-            # OAuth API 설정은 유지하고 나머지 세션만 초기화
-            saved_oauth_config = st.session_state.get("user_oauth_config")
-            for key in list(st.session_state.keys()):
-                del st.session_state[key]
-            if saved_oauth_config:
-                st.session_state.user_oauth_config = saved_oauth_config
+            # OAuth API 설정은 유지하고 앱이 관리하는 세션 값과 입력 위젯 상태를 초기화
+            default_inputs = [k for k in st.session_state if k.startswith(DEFAULT_INPUT_KEY_PREFIX)]
+            for key in [*DEFAULT_STATE, *LOGIN_STATE_KEYS, *WIDGET_STATE_KEYS, *default_inputs]:
+                if key != "user_oauth_config":
+                    st.session_state.pop(key, None)
+            st.session_state._uploader_gen = st.session_state.get("_uploader_gen", 0) + 1
             st.rerun()
 
         # ── Gmail 서명 설정 ──
         st.divider()
         st.subheader("✍️ Gmail 서명")
 
+        # 서명이 없거나 조회에 실패한 경우에도 SIGNATURE_RECHECK_SEC마다 한 번만 다시 조회
+        if (
+            not st.session_state.gmail_signature
+            and st.session_state.google_credentials
+            and time.time() - st.session_state.get("_signature_checked_at", 0) > SIGNATURE_RECHECK_SEC
+        ):
+            st.session_state.gmail_signature = _fetch_gmail_signature(
+                st.session_state.gmail_email, st.session_state.google_credentials
+            )
+            st.session_state._signature_checked_at = time.time()
+
         if st.session_state.gmail_signature:
             st.session_state.use_signature = st.toggle(
                 "서명 자동 첨부",
@@ -841,12 +1177,13 @@ with st.sidebar:
             creds = _get_credentials()
             if creds:
                 try:
-                    total_history = get_sent_count(creds)
+                    total_history = len(_get_already_sent(creds))
                     st.metric("누적 발송 완료", f"{total_history}건")
                     if total_history > 0:
                         st.caption("이미 발송한 수신자는 자동으로 건너뜁니다.\n이력은 내 Google Drive 시트에 저장됩니다.")
                         if st.button("🗑️ 이력 초기화", key="sidebar_clear_history", help="이력을 초기화하면 같은 수신자에게 다시 발송할 수 있습니다"):
                             clear_history(creds)
+                            _invalidate_sent_cache()
                             st.rerun()
                     else:
                         st.caption("아직 발송 이력이 없습니다.")
@@ -893,8 +1230,7 @@ with tab1:
     st.session_state.body_template = body_template
 
     # 사용된 변수 감지
-    all_text = subject_template + " " + body_template
-    used_vars = extract_variables(all_text)
+    used_vars = _get_used_vars()
 
     if used_vars:
         st.success(f"🔖 **사용된 변수 목록:** {', '.join(['{' + v + '}' for v in used_vars])}")
@@ -925,7 +1261,7 @@ with tab1:
                     default_val = st.text_input(
                         f"{{{var}}} 기본값",
                         value=st.session_state.defaults_map.get(var, ""),
-                        key=f"default_{var}",
+                        key=f"{DEFAULT_INPUT_KEY_PREFIX}{var}",
                     )
                     defaults_map[var] = default_val
             st.session_state.defaults_map = defaults_map
@@ -957,18 +1293,16 @@ with tab1:
         "첨부할 파일을 선택하세요",
         accept_multiple_files=True,
         help="PDF, 이미지, 문서 등 다양한 파일을 첨부할 수 있습니다. Gmail 제한: 총 25MB",
-        key="attachment_uploader",
+        key=_uploader_key("attachment_uploader"),
     )
 
     if attached_files:
         st.session_state.attachments = attached_files
-        total_size = sum(f.size for f in attached_files)
-        size_mb = total_size / (1024 * 1024)
+        size_mb, file_info, _ = _attachment_summary(_attachment_sig(attached_files))
 
-        if size_mb > 25:
-            st.error(f"⚠️ 총 첨부 파일 크기가 {size_mb:.1f}MB입니다. Gmail 제한(25MB)을 초과합니다.")
+        if size_mb > ATTACHMENT_LIMIT_MB:
+            st.error(f"⚠️ 총 첨부 파일 크기가 {size_mb:.1f}MB입니다. Gmail 제한({ATTACHMENT_LIMIT_MB}MB)을 초과합니다.")
         else:
-            file_info = ", ".join([f"**{f.name}** ({f.size/1024:.0f}KB)" for f in attached_files])
             st.success(f"📎 첨부 파일 {len(attached_files)}개: {file_info}  \n총 크기: {size_mb:.1f}MB")
     else:
         st.session_state.attachments = []
@@ -995,25 +1329,28 @@ with tab2:
             type=["xlsx", "xls"],
             help="수신자 목록이 담긴 .xlsx 또는 .xls 파일을 업로드하세요",
             label_visibility="collapsed",
+            key=_uploader_key("excel_uploader"),
         )
         st.markdown('</div>', unsafe_allow_html=True)
 
     if uploaded_file is not None:
         try:
-            df = read_excel(uploaded_file)
+            raw = uploaded_file.getvalue()
+            df_key = _upload_file_key(uploaded_file.file_id, raw)
+            df = read_excel_cached(df_key, raw)
+            # DataFrame·행 레코드·키는 함께 갱신한다 (공유 캐시에서 밀려나도 세션 값은 유지)
+            st.session_state.df_key = df_key
             st.session_state.df = df
+            st.session_state.df_records = get_records_cached(df_key, df)
 
             st.success(f"✅ 파일 업로드 완료: **{uploaded_file.name}** (총 {len(df)}건)")
 
             # 데이터 미리보기
             st.subheader("📋 데이터 미리보기")
 
-            def highlight_empty(val):
-                if pd.isna(val) or str(val).strip() == "":
-                    return "background-color: #FFF3CD; color: #856404;"
-                return ""
-
-            styled_df = df.head(10).style.map(highlight_empty)
+            head_df = df.head(10)
+            head_styles = _empty_cell_styles(st.session_state.df_key, head_df)
+            styled_df = head_df.style.apply(lambda _: head_styles, axis=None)
             st.dataframe(styled_df, use_container_width=True)
 
             if len(df) > 10:
@@ -1024,14 +1361,10 @@ with tab2:
             st.subheader("🔗 변수 연결")
 
             columns = get_column_names(df)
+            col_to_idx = {col: i for i, col in enumerate(columns)}
 
             # 이메일 열 자동 추측
-            email_guess_idx = 0
-            for i, col in enumerate(columns):
-                col_lower = col.lower()
-                if "email" in col_lower or "이메일" in col_lower or "메일" in col_lower or "mail" in col_lower:
-                    email_guess_idx = i
-                    break
+            email_guess_idx = _guess_email_column_idx(tuple(columns))
 
             email_column = st.selectbox(
                 "📮 수신 이메일 열 선택 (필수)",
@@ -1042,39 +1375,29 @@ with tab2:
             st.session_state.email_column = email_column
 
             # 템플릿 변수와 엑셀 열 매핑
-            used_vars = extract_variables(
-                st.session_state.subject_template + " " + st.session_state.body_template
-            )
+            used_vars = _get_used_vars()
 
             if used_vars:
                 st.caption("템플릿 변수와 엑셀 열을 연결하세요. (같은 이름이면 자동 매칭됩니다)")
 
-                mapping = {}
-                for var in used_vars:
-                    auto_idx = 0
-                    matched = False
-                    for i, col in enumerate(columns):
-                        if col == var:
-                            auto_idx = i
-                            matched = True
-                            break
-
-                    col1, col2 = st.columns([3, 1])
-                    with col1:
-                        selected_col = st.selectbox(
-                            f"{{{var}}}",
-                            options=columns,
-                            index=auto_idx,
-                            key=f"map_{var}",
-                        )
-                        mapping[var] = selected_col
-                    with col2:
-                        if matched:
-                            st.markdown("<br>", unsafe_allow_html=True)
-                            st.success("✅ 자동 매칭")
-                        else:
-                            st.markdown("<br>", unsafe_allow_html=True)
-                            st.warning("🔧 수동 선택")
+                # 변수별 selectbox 대신 표 하나로 매핑 (위젯 수 최소화)
+                mapping_df = pd.DataFrame({
+                    "변수": [f"{{{var}}}" for var in used_vars],
+                    "엑셀 열": [columns[col_to_idx.get(var, 0)] for var in used_vars],
+                    "상태": ["✅ 자동 매칭" if var in col_to_idx else "🔧 수동 선택" for var in used_vars],
+                })
+                edited_mapping = st.data_editor(
+                    mapping_df,
+                    column_config={
+                        "변수": st.column_config.TextColumn(disabled=True),
+                        "엑셀 열": st.column_config.SelectboxColumn(options=columns, required=True),
+                        "상태": st.column_config.TextColumn(disabled=True),
+                    },
+                    hide_index=True,
+                    num_rows="fixed",
+                    use_container_width=True,
+                )
+                mapping = dict(zip(used_vars, edited_mapping["엑셀 열"]))
 
                 st.session_state.column_mapping = mapping
             else:
@@ -1086,7 +1409,9 @@ with tab2:
                 st.subheader("📊 데이터 요약")
 
                 mapped_vars = [st.session_state.column_mapping.get(v, v) for v in used_vars]
-                analysis = analyze_data(df, mapped_vars, email_column)
+                analysis = analyze_data_cached(
+                    st.session_state.df_key, df, tuple(mapped_vars), email_column
+                )
 
                 col1, col2, col3, col4 = st.columns(4)
                 with col1:
@@ -1116,11 +1441,15 @@ with tab2:
 with tab3:
     st.subheader("👁️ 발송 미리보기")
 
-    df = st.session_state.df
-    subject_t = st.session_state.subject_template
-    body_t = st.session_state.body_template
-    email_col = st.session_state.email_column
-    col_mapping = st.session_state.column_mapping
+    # 세션 값은 블록 시작 시 한 번만 읽어 지역 변수로 사용
+    ss = st.session_state
+    df = _session_df()
+    subject_t, body_t = ss.subject_template, ss.body_template
+    email_col, col_mapping = ss.email_column, ss.column_mapping
+    df_key, df_records = ss.df_key, ss.df_records
+    empty_handling, defaults_map = ss.empty_handling, ss.defaults_map
+    attachments = ss.attachments
+    gmail_signature = ss.gmail_signature if ss.use_signature else ""
 
     if df is None:
         st.info("💡 Step 2에서 먼저 엑셀 파일을 업로드해주세요.")
@@ -1129,15 +1458,13 @@ with tab3:
     elif not email_col:
         st.info("💡 Step 2에서 이메일 열을 선택해주세요.")
     else:
-        used_vars = extract_variables(subject_t + " " + body_t)
+        used_vars = _get_used_vars()
 
         # 유효한 행만 필터링
-        valid_indices = []
-        for idx in range(len(df)):
-            row_data = get_row_data(df, idx)
-            email_val = row_data.get(email_col, "")
-            if email_val and email_val != "nan":
-                valid_indices.append(idx)
+        if email_col in df.columns:
+            valid_indices = _valid_email_indices_cached(df_key, email_col, df[email_col])
+        else:
+            valid_indices = []
 
         if not valid_indices:
             st.error("❌ 발송 가능한 데이터가 없습니다. 이메일 열을 확인해주세요.")
@@ -1161,25 +1488,18 @@ with tab3:
 
             # 현재 행 데이터
             current_row_idx = valid_indices[preview_idx - 1]
-            row_data = get_row_data(df, current_row_idx)
-
-            mapped_data = {}
-            for var in used_vars:
-                mapped_col = col_mapping.get(var, var)
-                mapped_data[var] = row_data.get(mapped_col, "")
-
-            defaults = st.session_state.defaults_map if st.session_state.empty_handling == "defaults" else {}
-            alt_sub = st.session_state.alt_subject if st.session_state.empty_handling == "alt_template" else None
-            alt_bod = st.session_state.alt_body if st.session_state.empty_handling == "alt_template" else None
-
-            rendered = render_email(
-                subject_template=subject_t,
-                body_template=body_t,
-                data=mapped_data,
-                defaults=defaults,
-                alt_subject_template=alt_sub,
-                alt_body_template=alt_bod,
+            row_data = df_records[current_row_idx]
+
+            defaults = defaults_map if empty_handling == "defaults" else {}
+            alt_sub = ss.alt_subject if empty_handling == "alt_template" else None
+            alt_bod = ss.alt_body if empty_handling == "alt_template" else None
+
+            rendered_all = _render_all(
+                subject_t, body_t, df_key,
+                tuple(col_mapping.items()), tuple(defaults.items()), alt_sub, alt_bod,
+                df,
             )
+            rendered = rendered_all[current_row_idx]
 
             to_email = row_data.get(email_col, "")
 
@@ -1191,11 +1511,11 @@ with tab3:
                 st.caption("📌 별도 템플릿 적용됨")
 
             # 첨부파일 표시
-            if st.session_state.attachments:
-                att_names = ", ".join([f"📎 {f.name}" for f in st.session_state.attachments])
+            if attachments:
+                att_names = ", ".join([f"📎 {f.name}" for f in attachments])
                 st.markdown(f"**Attachments:** {att_names}")
 
-            empty_vars = get_empty_variables(mapped_data, used_vars)
+            empty_vars = rendered["empty_vars"]
             if empty_vars:
                 st.warning(f"⚠️ 빈 값 변수: {', '.join(empty_vars)}")
 
@@ -1204,10 +1524,10 @@ with tab3:
             # 본문 + 서명 미리보기
             body_html = rendered['body'].replace(chr(10), '<br>')
             sig_html = ""
-            if st.session_state.use_signature and st.session_state.gmail_signature:
+            if gmail_signature:
                 sig_html = (
                     f'<div style="padding-top: 8px; margin-top: 16px;">'
-                    f'{st.session_state.gmail_signature}'
+                    f'{gmail_signature}'
                     f'</div>'
                 )
 
@@ -1217,38 +1537,42 @@ with tab3:
             # 빈 값 요약
             st.divider()
             mapped_vars_for_analysis = [col_mapping.get(v, v) for v in used_vars]
-            analysis = analyze_data(df, mapped_vars_for_analysis, email_col)
+            analysis = analyze_data_cached(
+                df_key, df, tuple(mapped_vars_for_analysis), email_col
+            )
 
             if analysis["empty_details"]:
                 st.subheader(f"⚠️ 빈 값이 있는 메일 ({analysis['has_empty']}건)")
 
-                empty_summary = []
-                for detail in analysis["empty_details"]:
-                    handling = ""
-                    if st.session_state.empty_handling == "defaults":
-                        parts = []
-                        for ev in detail["empty_vars"]:
-                            var_name = ev
-                            for v, mapped_col in col_mapping.items():
-                                if mapped_col == ev:
-                                    var_name = v
-                                    break
-                            default_val = st.session_state.defaults_map.get(var_name, "")
-                            if default_val:
-                                parts.append(f'→ "{default_val}"')
-                            else:
-                                parts.append("→ (빈 채로)")
-                        handling = ", ".join(parts)
-                    else:
-                        handling = "별도 템플릿 적용"
+                # 상세 표는 펼쳤을 때만 생성 (미리보기 이동 시 재계산 방지)
+                if st.toggle("수신자별 처리 방식 보기", key="show_empty_summary"):
+                    empty_summary = []
+                    for detail in analysis["empty_details"]:
+                        handling = ""
+                        if empty_handling == "defaults":
+                            parts = []
+                            for ev in detail["empty_vars"]:
+                                var_name = ev
+                                for v, mapped_col in col_mapping.items():
+                                    if mapped_col == ev:
+                                        var_name = v
+                                        break
+                                default_val = defaults_map.get(var_name, "")
+                                if default_val:
+                                    parts.append(f'→ "{default_val}"')
+                                else:
+                                    parts.append("→ (빈 채로)")
+                            handling = ", ".join(parts)
+                        else:
+                            handling = "별도 템플릿 적용"
 
-                    empty_summary.append({
-                        "수신자": detail["email"],
-                        "빈 변수": ", ".join(detail["empty_vars"]),
-                        "처리 방식": handling,
-                    })
+                        empty_summary.append({
+                            "수신자": detail["email"],
+                            "빈 변수": ", ".join(detail["empty_vars"]),
+                            "처리 방식": handling,
+                        })
 
-                st.dataframe(pd.DataFrame(empty_summary), use_container_width=True)
+                    st.dataframe(pd.DataFrame(empty_summary), use_container_width=True)
 
             st.divider()
             st.success(
@@ -1269,7 +1593,7 @@ with tab4:
     if _bg_sending:
         _show_send_progress()
 
-    df = st.session_state.df
+    df = _session_df()
     subject_t = st.session_state.subject_template
     body_t = st.session_state.body_template
     email_col = st.session_state.email_column
@@ -1293,59 +1617,54 @@ with tab4:
         can_send = False
 
     if can_send:
-        used_vars = extract_variables(subject_t + " " + body_t)
+        used_vars = _get_used_vars()
 
         # 이미 발송한 이메일 목록 로드
         creds = _get_credentials()
         already_sent = set()
         if creds:
             try:
-                already_sent = get_sent_emails(creds)
+                already_sent = _get_already_sent(creds)
             except Exception as e:
                 st.warning(f"⚠️ 발송 이력을 불러올 수 없습니다: {e}\n\n중복 발송 방지 기능이 작동하지 않을 수 있습니다.")
 
+        defaults = st.session_state.defaults_map if st.session_state.empty_handling == "defaults" else {}
+        alt_sub = st.session_state.alt_subject if st.session_state.empty_handling == "alt_template" else None
+        alt_bod = st.session_state.alt_body if st.session_state.empty_handling == "alt_template" else None
+        rendered_all = _render_all(
+            subject_t, body_t, st.session_state.df_key,
+            tuple(col_mapping.items()), tuple(defaults.items()), alt_sub, alt_bod,
+            df,
+        )
+
         # 발송 대상 이메일 목록 생성 (이미 보낸 건 제외)
         email_list = []
-        skipped_already_sent = 0
-        total_all = 0
-
-        for idx in range(len(df)):
-            row_data = get_row_data(df, idx)
-            to_email = row_data.get(email_col, "")
-
-            if not to_email or to_email == "nan":
-                continue
-
-            total_all += 1
-
-            # 이미 보낸 이메일은 건너뛰기
-            if to_email.strip().lower() in already_sent:
-                skipped_already_sent += 1
-                continue
 
-            mapped_data = {}
-            for var in used_vars:
-                mapped_col = col_mapping.get(var, var)
-                mapped_data[var] = row_data.get(mapped_col, "")
-
-            defaults = st.session_state.defaults_map if st.session_state.empty_handling == "defaults" else {}
-            alt_sub = st.session_state.alt_subject if st.session_state.empty_handling == "alt_template" else None
-            alt_bod = st.session_state.alt_body if st.session_state.empty_handling == "alt_template" else None
-
-            rendered = render_email(
-                subject_template=subject_t,
-                body_template=body_t,
-                data=mapped_data,
-                defaults=defaults,
-                alt_subject_template=alt_sub,
-                alt_body_template=alt_bod,
-            )
-
-            empty_vars_list = get_empty_variables(mapped_data, used_vars)
+        # 이메일 열만 한 번에 문자열로 정리 (행마다 iloc 조회하지 않음)
+        if email_col in df.columns:
+            email_series = df[email_col]
+            to_emails = email_series.astype(object).where(email_series.notna(), "").astype(str).str.strip()
+        else:
+            to_emails = pd.Series("", index=df.index)
+
+        # 이메일 유무 / 이미 보낸 이메일 / 목록 내 중복(첫 행만 발송) 여부를 열 단위로 판정
+        lowered = to_emails.str.lower()
+        valid_mask = to_emails.ne("") & to_emails.ne("nan")
+        sent_mask = valid_mask & lowered.isin(already_sent)
+        duplicate_mask = valid_mask & ~sent_mask & lowered.duplicated()
+        new_mask = valid_mask & ~sent_mask & ~duplicate_mask
+        total_all = int(valid_mask.sum())
+        skipped_already_sent = int(sent_mask.sum())
+        skipped_duplicates = int(duplicate_mask.sum())
+
+        to_email_values = to_emails.to_numpy()
+        for idx in new_mask.to_numpy().nonzero()[0]:
+            to_email = to_email_values[idx]
+            rendered = rendered_all[idx]
             note = ""
             if rendered["used_alt"]:
                 note = "별도 템플릿"
-            elif empty_vars_list:
+            elif rendered["empty_vars"]:
                 note = "기본값 적용"
 
             email_list.append({
@@ -1367,10 +1686,13 @@ with tab4:
                 f"전체 {total_all}건 중 **미발송 {total}건**만 발송합니다."
             )
 
+        if skipped_duplicates > 0:
+            st.info(f"📎 같은 이메일이 여러 행에 있는 {skipped_duplicates}건은 첫 번째 행으로 한 번만 발송합니다.")
+
         if total == 0 and skipped_already_sent > 0:
             st.info("🎉 모든 수신자에게 이미 발송 완료되었습니다!")
             try:
-                _hist_count = get_sent_count(creds) if creds else 0
+                _hist_count = len(_get_already_sent(creds)) if creds else 0
             except Exception:
                 _hist_count = "?"
             st.caption(f"총 발송 이력: {_hist_count}건")
@@ -1378,6 +1700,7 @@ with tab4:
             if st.button("🗑️ 발송 이력 초기화", help="이력을 초기화하면 모든 수신자에게 다시 발송할 수 있습니다"):
                 if creds:
                     clear_history(creds)
+                    _invalidate_sent_cache()
                 st.rerun()
 
         elif total > 0:
@@ -1391,7 +1714,7 @@ with tab4:
             attach_info = ""
             if st.session_state.attachments:
                 att_count = len(st.session_state.attachments)
-                att_size = sum(f.size for f in st.session_state.attachments) / (1024 * 1024)
+                att_size, _, _ = _attachment_summary(_attachment_sig(st.session_state.attachments))
                 attach_info = f"  \n📎 첨부 파일: {att_count}개 ({att_size:.1f}MB)"
 
             st.info(
@@ -1463,10 +1786,19 @@ with tab4:
             st.divider()
             st.subheader("📋 발송 결과")
 
-            results_df = pd.DataFrame(st.session_state.send_results)
+            # 이력에 기록하지 못한 수신자는 다음 세션에서 다시 발송될 수 있으므로 알린다
+            unsaved = (st.session_state.send_progress or {}).get("history_unsaved")
+            if unsaved:
+                st.warning(
+                    f"⚠️ 발송에 성공한 {len(unsaved)}건을 발송 이력에 저장하지 못했습니다.  \n"
+                    f"이 세션에서는 건너뛰지만, 다음 로그인 때는 다시 발송될 수 있습니다. "
+                    f"결과 CSV를 보관해 두세요.  \n"
+                    f"{', '.join(unsaved[:20])}{' ...' if len(unsaved) > 20 else ''}"
+                )
+
+            results_df, csv = _send_results_table()
             st.dataframe(results_df, use_container_width=True)
 
-            csv = results_df.to_csv(index=False).encode("utf-8-sig")
             st.download_button(
                 label="📥 결과 CSV 다운로드",
                 data=csv,
@@ -1488,6 +1820,7 @@ with tab4:
                     creds = _get_credentials()
                     if creds:
                         clear_history(creds)
+                        _invalidate_sent_cache()
                     st.session_state.sending_done = False
                     st.session_state.send_results = []
                     st.session_state.send_thread_running = False
@@ -1496,7 +1829,7 @@ with tab4:
 
             creds_for_count = _get_credentials()
             try:
-                total_count = get_sent_count(creds_for_count) if creds_for_count else 0
+                total_count = len(_get_already_sent(creds_for_count)) if creds_for_count else 0
             except Exception:
                 total_count = "?"
             st.caption(f"📋 총 누적 발송 이력: {total_count}건")
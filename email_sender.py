@@ -4,8 +4,11 @@ Gmail 메일 발송 모듈
 - 연결 테스트
 - 단일/대량 메일 발송
 - 발송 간격 제어
+- 끊긴 연결 자동 재연결
+- 일시적 오류 재시도 (지수 백오프 + 지터)
 """
 
+import random
 import smtplib
 import ssl
 import time
@@ -17,6 +20,9 @@ SMTP_SERVER = "smtp.gmail.com"
 SMTP_SSL_PORT = 465
 SMTP_TLS_PORT = 587
 
+# 재시도할 일시적 오류 (이 밖에 4xx SMTP 응답도 재시도)
+RETRYABLE_ERRORS = (smtplib.SMTPServerDisconnected, TimeoutError, ConnectionResetError)
+
 
 def _clean_password(app_password: str) -> str:
     """앱 비밀번호에서 공백을 제거한다. (Google이 4자리씩 공백으로 표시하므로)"""
@@ -29,6 +35,33 @@ def _create_ssl_context() -> ssl.SSLContext:
     return ctx
 
 
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+    """attempt번째(0부터) 재시도 전 대기 시간. base * 2^attempt (최대 cap) + 0~0.5초 지터."""
+    return min(cap, base * 2 ** attempt) + random.uniform(0, 0.5)
+
+
+def _is_retryable(error: Exception) -> bool:
+    """연결 끊김/타임아웃 또는 4xx(일시적) SMTP 응답이면 True."""
+    if isinstance(error, RETRYABLE_ERRORS):
+        return True
+    code = getattr(error, "smtp_code", None)
+    return isinstance(code, int) and code // 100 == 4
+
+
+def send_with_retry(fn: Callable, *args, max_attempts: int = 3, base: float = 1.0, cap: float = 30.0, **kwargs):
+    """
+    fn(*args, **kwargs)를 호출하고, 일시적 오류면 지수 백오프로 재시도한다.
+    재시도할 수 없는 오류나 마지막 시도의 오류는 그대로 전파한다.
+    """
+    for attempt in range(max_attempts):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == max_attempts - 1 or not _is_retryable(e):
+                raise
+            time.sleep(backoff_delay(attempt, base, cap))
+
+
 def _connect_smtp(email: str, app_password: str, timeout: int = 15) -> smtplib.SMTP_SSL:
     """
     Gmail SMTP에 연결하고 로그인한다.
@@ -60,6 +93,13 @@ def _connect_smtp(email: str, app_password: str, timeout: int = 15) -> smtplib.S
     return server
 
 
+def _close_quietly(server: smtplib.SMTP) -> None:
+    try:
+        server.quit()
+    except Exception:
+        pass
+
+
 def test_connection(email: str, app_password: str) -> tuple[bool, str]:
     """
     Gmail SMTP 연결을 테스트한다.
@@ -96,6 +136,39 @@ def test_connection(email: str, app_password: str) -> tuple[bool, str]:
         return False, f"연결 오류 ({type(e).__name__}): {e}"
 
 
+def _build_message(
+    from_email: str,
+    from_name: str,
+    to_email: str,
+    subject: str,
+    body: str,
+    is_html: bool = False,
+) -> MIMEMultipart:
+    """발송할 MIME 메시지를 만든다."""
+    msg = MIMEMultipart("alternative")
+    msg["From"] = f"{from_name} <{from_email}>" if from_name else from_email
+    msg["To"] = to_email
+    msg["Subject"] = subject
+
+    # 줄바꿈을 <br>로 변환 (plain text인 경우에도 HTML로 감싸서 줄바꿈 유지)
+    if not is_html:
+        html_body = body.replace("\n", "<br>")
+        msg.attach(MIMEText(body, "plain", "utf-8"))
+        msg.attach(MIMEText(html_body, "html", "utf-8"))
+    else:
+        msg.attach(MIMEText(body, "html", "utf-8"))
+    return msg
+
+
+def _describe_send_error(error: Exception) -> str:
+    """발송 예외를 결과 메시지로 바꾼다."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return "수신자 주소 오류"
+    if isinstance(error, smtplib.SMTPException):
+        return f"SMTP 오류: {error}"
+    return f"발송 오류: {error}"
+
+
 def send_single_email(
     smtp_connection: smtplib.SMTP_SSL,
     from_email: str,
@@ -121,28 +194,11 @@ def send_single_email(
         (성공 여부, 메시지)
     """
     try:
-        msg = MIMEMultipart("alternative")
-        msg["From"] = f"{from_name} <{from_email}>" if from_name else from_email
-        msg["To"] = to_email
-        msg["Subject"] = subject
-
-        content_type = "html" if is_html else "plain"
-        # 줄바꿈을 <br>로 변환 (plain text인 경우에도 HTML로 감싸서 줄바꿈 유지)
-        if not is_html:
-            html_body = body.replace("\n", "<br>")
-            msg.attach(MIMEText(body, "plain", "utf-8"))
-            msg.attach(MIMEText(html_body, "html", "utf-8"))
-        else:
-            msg.attach(MIMEText(body, "html", "utf-8"))
-
+        msg = _build_message(from_email, from_name, to_email, subject, body, is_html)
         smtp_connection.send_message(msg)
         return True, "발송 성공"
-    except smtplib.SMTPRecipientsRefused:
-        return False, "수신자 주소 오류"
-    except smtplib.SMTPException as e:
-        return False, f"SMTP 오류: {e}"
     except Exception as e:
-        return False, f"발송 오류: {e}"
+        return False, _describe_send_error(e)
 
 
 def send_bulk_emails(
@@ -154,7 +210,12 @@ def send_bulk_emails(
     progress_callback: Optional[Callable] = None,
 ) -> list[dict]:
     """
-    대량 메일을 발송한다.
+    대량 메일을 발송한다. (앱의 Step 4는 Gmail API로 발송하며 이 함수를 쓰지 않는다)
+
+    메일은 하나의 SMTP 연결로 순서대로 보내고 메일 사이에 delay_seconds만큼 기다린다.
+    연결 끊김/4xx 같은 일시적 오류는 send_with_retry로 지수 백오프 재시도하고,
+    끊긴 연결은 다음 시도에서 새로 연결한다.
+    MIME 메시지는 발송 시작 전에 모두 만들어 두므로, 연결을 잡은 동안에는 전송만 한다.
 
     Args:
         from_email: 발신자 이메일
@@ -169,42 +230,66 @@ def send_bulk_emails(
     """
     results = []
     total = len(email_list)
+    conn: dict[str, Optional[smtplib.SMTP]] = {"server": None}  # 끊기면 None → 다음 전송 때 재연결
+
+    # MIME 메시지는 연결을 잡기 전에 모두 만들어 둔다 (연결 구간에서는 전송만)
+    messages: list = []
+    for email_data in email_list:
+        try:
+            messages.append(_build_message(
+                from_email, from_name, email_data["to"], email_data["subject"], email_data["body"],
+            ))
+        except Exception as e:
+            messages.append(e)
+
+    def _deliver(msg) -> None:
+        # 연결이 없으면(첫 발송이거나 끊긴 뒤) 새로 연결한다 — 연결 단계 오류는 재시도 대상
+        if conn["server"] is None:
+            conn["server"] = _connect_smtp(from_email, app_password, timeout=30)
+        try:
+            conn["server"].send_message(msg)
+        except RETRYABLE_ERRORS as e:
+            # 전송 도중 끊기면 서버가 이미 받았을 수 있으므로 다시 보내지 않는다
+            # (재시도 대상이 아닌 SMTPException으로 바꿔 이 메일만 실패 처리, 다음 메일은 새 연결)
+            _close_quietly(conn["server"])
+            conn["server"] = None
+            raise smtplib.SMTPException(f"전송 중 연결 끊김 — 발송 여부 확인 필요 ({e})") from e
+        except smtplib.SMTPResponseException as e:
+            if e.smtp_code == 421:
+                # 421은 서버가 연결을 닫는다는 뜻 — 재시도는 새 연결로 한다
+                _close_quietly(conn["server"])
+                conn["server"] = None
+            raise
 
     try:
-        server = _connect_smtp(from_email, app_password, timeout=30)
+        for i, (email_data, msg) in enumerate(zip(email_list, messages)):
+            if isinstance(msg, Exception):
+                success, message = False, _describe_send_error(msg)
+            else:
+                try:
+                    send_with_retry(_deliver, msg)
+                    success, message = True, "발송 성공"
+                except smtplib.SMTPAuthenticationError:
+                    raise
+                except (smtplib.SMTPException, *RETRYABLE_ERRORS) as e:
+                    # 재시도 후에도 실패한 일시적 오류는 이 메일만 실패 처리
+                    success, message = False, _describe_send_error(e)
+
+            result = {
+                "to": email_data["to"],
+                "success": success,
+                "message": message,
+                "time": time.strftime("%H:%M:%S"),
+                "note": email_data.get("note", ""),
+            }
+            results.append(result)
 
-        try:
-            for i, email_data in enumerate(email_list):
-                to_email = email_data["to"]
-                subject = email_data["subject"]
-                body = email_data["body"]
-
-                success, message = send_single_email(
-                    smtp_connection=server,
-                    from_email=from_email,
-                    from_name=from_name,
-                    to_email=to_email,
-                    subject=subject,
-                    body=body,
-                )
-
-                result = {
-                    "to": to_email,
-                    "success": success,
-                    "message": message,
-                    "time": time.strftime("%H:%M:%S"),
-                    "note": email_data.get("note", ""),
-                }
-                results.append(result)
-
-                if progress_callback:
-                    progress_callback(i + 1, total, result)
-
-                # 마지막 메일이 아닐 때만 대기
-                if i < total - 1:
-                    time.sleep(delay_seconds)
-        finally:
-            server.quit()
+            if progress_callback:
+                progress_callback(i + 1, total, result)
+
+            # 마지막 메일이 아닐 때만 대기
+            if i < total - 1:
+                time.sleep(delay_seconds)
 
     except smtplib.SMTPAuthenticationError:
         # 인증 실패 시 모든 나머지 메일을 실패 처리
@@ -226,5 +311,8 @@ def send_bulk_emails(
                 "time": time.strftime("%H:%M:%S"),
                 "note": "",
             })
+    finally:
+        if conn["server"] is not None:
+            _close_quietly(conn["server"])
 
     return results
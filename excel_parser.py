@@ -5,7 +5,10 @@
 - 빈 데이터 감지 및 요약
 """
 
+import hashlib
+import numpy as np
 import pandas as pd
+import streamlit as st
 from io import BytesIO
 from typing import Optional
 
@@ -30,6 +33,25 @@ def read_excel(file: BytesIO, sheet_name: Optional[str] = None) -> pd.DataFrame:
         raise ValueError(f"엑셀 파일을 읽는 중 오류가 발생했습니다: {e}")
 
 
+def get_file_key(data: bytes) -> str:
+    """업로드 파일 바이트 내용의 해시 키를 반환한다."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+@st.cache_resource(show_spinner="엑셀 파싱 중...", max_entries=8)
+def read_excel_cached(df_key: str, _data: bytes) -> pd.DataFrame:
+    """
+    파일 해시 키별로 파싱한 DataFrame을 모든 세션이 공유한다.
+    같은 파일은 다시 파싱하지 않는다. 캐시에서 밀려날 수 있으므로 세션은 받은 DataFrame을 직접 보관한다.
+    반환된 DataFrame은 세션 간에 공유되므로 수정하지 않는다.
+
+    Args:
+        df_key: get_file_key로 만든 파일 해시
+        _data: 업로드된 파일의 바이트 내용 (캐시에 없을 때 파싱)
+    """
+    return read_excel(BytesIO(_data))
+
+
 def get_sheet_names(file: BytesIO) -> list[str]:
     """엑셀 파일의 시트 이름 목록을 반환한다."""
     try:
@@ -44,6 +66,16 @@ def get_column_names(df: pd.DataFrame) -> list[str]:
     return list(df.columns)
 
 
+def get_valid_email_indices(emails: pd.Series) -> list[int]:
+    """
+    이메일 값이 있는 행의 위치 인덱스 목록을 반환한다.
+    행 단위 루프 대신 열 전체를 한 번에 검사한다.
+    """
+    normalized = emails.astype(str).str.strip()
+    mask = emails.notna() & normalized.ne("") & normalized.ne("nan")
+    return mask.to_numpy().nonzero()[0].tolist()
+
+
 def analyze_data(df: pd.DataFrame, used_variables: list[str], email_column: str) -> dict:
     """
     데이터의 빈 값 상태를 분석한다.
@@ -63,38 +95,53 @@ def analyze_data(df: pd.DataFrame, used_variables: list[str], email_column: str)
         }
     """
     total = len(df)
-    no_email = 0
-    complete = 0
-    has_empty = 0
-    empty_details = []
+
+    # 이메일 열 정규화 (한 번에 문자열 변환 + 공백 제거)
+    if email_column in df.columns:
+        emails = df[email_column].astype(str).str.strip()
+        no_email_mask = df[email_column].isna() | emails.eq("") | emails.eq("nan")
+    else:
+        emails = pd.Series("", index=df.index)
+        no_email_mask = pd.Series(True, index=df.index)
+    no_email_mask = no_email_mask.to_numpy(dtype=bool)
+
+    no_email = int(no_email_mask.sum())
 
     # 분석 대상 열 (사용된 변수 중 실제로 존재하는 열)
     check_columns = [v for v in used_variables if v in df.columns]
 
-    for idx, row in df.iterrows():
-        email = str(row.get(email_column, "")).strip()
-
-        # 이메일이 비어있는 경우
-        if not email or email == "nan":
-            no_email += 1
-            continue
-
-        # 사용된 변수 중 빈 값이 있는지 확인
-        empty_vars = []
-        for col in check_columns:
-            val = row.get(col, "")
-            if pd.isna(val) or str(val).strip() == "":
-                empty_vars.append(col)
-
-        if empty_vars:
-            has_empty += 1
-            empty_details.append({
-                "row": idx + 2,  # 엑셀 행 번호 (헤더=1행, 데이터 시작=2행)
-                "email": email,
-                "empty_vars": empty_vars,
-            })
-        else:
-            complete += 1
+    # 검사할 변수 열이 없으면 이메일 유무만 세면 된다
+    if not check_columns:
+        return {
+            "total": total,
+            "complete": total - no_email,
+            "has_empty": 0,
+            "no_email": no_email,
+            "empty_details": [],
+        }
+
+    # 행 x 변수 빈 값 행렬 (열 단위 벡터 연산)
+    empty_matrix = np.column_stack([
+        (df[col].isna() | df[col].astype(str).str.strip().eq("")).to_numpy()
+        for col in check_columns
+    ])
+
+    has_empty_mask = empty_matrix.any(axis=1) & ~no_email_mask
+    has_empty = int(has_empty_mask.sum())
+    complete = total - no_email - has_empty
+
+    empty_details = [
+        {
+            "row": int(idx) + 2,  # 엑셀 행 번호 (헤더=1행, 데이터 시작=2행)
+            "email": email,
+            "empty_vars": [col for col, is_empty in zip(check_columns, flags) if is_empty],
+        }
+        for idx, email, flags in zip(
+            df.index[has_empty_mask],
+            emails.to_numpy()[has_empty_mask],
+            empty_matrix[has_empty_mask],
+        )
+    ]
 
     return {
         "total": total,
@@ -105,6 +152,20 @@ def analyze_data(df: pd.DataFrame, used_variables: list[str], email_column: str)
     }
 
 
+@st.cache_data(show_spinner=False, max_entries=16)
+def analyze_data_cached(
+    df_key: str,
+    _df: pd.DataFrame,
+    used_variables: tuple[str, ...],
+    email_column: str,
+) -> dict:
+    """
+    analyze_data 결과를 (파일 해시, 변수, 이메일 열) 조합별로 캐시한다.
+    DataFrame 자체는 해시하지 않고 업로드 파일의 df_key를 키로 사용한다.
+    """
+    return analyze_data(_df, list(used_variables), email_column)
+
+
 def get_row_data(df: pd.DataFrame, row_idx: int) -> dict[str, str]:
     """
     특정 행의 데이터를 {열이름: 값} 딕셔너리로 반환한다.
@@ -119,3 +180,22 @@ def get_row_data(df: pd.DataFrame, row_idx: int) -> dict[str, str]:
         else:
             data[col] = str(val).strip()
     return data
+
+
+def get_records(df: pd.DataFrame) -> list[dict[str, str]]:
+    """
+    전체 행을 get_row_data와 같은 규칙({열이름: 값}, NaN은 빈 문자열)의
+    딕셔너리 리스트로 한 번에 변환한다.
+    """
+    cleaned = df.astype(object).where(df.notna(), "")
+    cleaned = cleaned.apply(lambda col: col.astype(str).str.strip())
+    return cleaned.to_dict("records")
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def get_records_cached(df_key: str, _df: pd.DataFrame) -> list[dict[str, str]]:
+    """
+    get_records 결과를 파일 해시별로 공유 캐시한다.
+    반환된 리스트는 세션 간에 공유되므로 수정하지 않는다.
+    """
+    return get_records(_df)
@@ -10,19 +10,29 @@ from __future__ import annotations
 
 import os
 import base64
+import hashlib
+import json
 import mimetypes
+import random
+import threading
+import time
+from datetime import datetime
 import streamlit as st
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
-from email import encoders
 from email.header import Header
 from email.utils import formataddr
 
 from google_auth_oauthlib.flow import Flow
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+import google_auth_httplib2
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document
 from googleapiclient.errors import HttpError
+from googleapiclient.http import build_http
+
 
 # 로컬 개발 시 HTTP 허용 (프로덕션에서는 자동으로 HTTPS 사용)
 if os.environ.get("STREAMLIT_SERVER_ADDRESS", "localhost") == "localhost":
@@ -77,6 +87,12 @@ def _get_oauth_config() -> dict | None:
         return st.session_state.user_oauth_config
 
     # 2. st.secrets에서 가져오기
+    return _cached_secrets_config()
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _cached_secrets_config() -> dict | None:
+    """secrets.toml의 OAuth 설정을 읽어 5분간 캐시한다. (rerun마다 secrets를 다시 읽지 않음)"""
     try:
         return {
             "client_id": st.secrets["google"]["client_id"],
@@ -173,8 +189,8 @@ def get_user_info(credentials: Credentials) -> dict:
     Returns:
         {"email": "...", "name": "...", "picture": "..."}
     """
-    service = build("oauth2", "v2", credentials=credentials)
-    user_info = service.userinfo().get().execute()
+    service = get_api_service("oauth2", "v2", credentials)
+    user_info = execute_with_retry(service.userinfo().get())
     return user_info
 
 
@@ -191,21 +207,162 @@ def credentials_to_dict(credentials: Credentials) -> dict:
         "client_id": credentials.client_id,
         "client_secret": credentials.client_secret,
         "scopes": list(credentials.scopes) if credentials.scopes else list(SCOPES),
+        # 만료 시각도 저장해야 복원 후 만료 여부를 판단할 수 있다 (UTC, ISO 8601)
+        "expiry": credentials.expiry.isoformat() if credentials.expiry else None,
     }
 
 
 def credentials_from_dict(cred_dict: dict) -> Credentials:
     """딕셔너리에서 Credentials 객체를 복원한다."""
-    return Credentials(**cred_dict)
+    cred_dict = dict(cred_dict)
+    expiry = cred_dict.pop("expiry", None)
+    credentials = Credentials(**cred_dict)
+    if expiry:
+        credentials.expiry = datetime.fromisoformat(expiry)
+    return credentials
+
+
+def refresh_if_expired(credentials: Credentials) -> bool:
+    """
+    access token이 만료되었거나 곧 만료되면 미리 갱신한다.
+    유효한 토큰은 그대로 쓰므로 토큰 수명당 갱신 요청은 한 번뿐이다.
+
+    Returns:
+        갱신했으면 True (호출한 쪽에서 credentials_to_dict로 다시 저장)
+    """
+    if not credentials.expired or not credentials.refresh_token:
+        return False
+    credentials.refresh(google_auth_httplib2.Request(build_http()))
+    return True
+
+
+# ─────────────────────────────────────────────────────────
+# API 서비스 객체 (Gmail / Sheets / Drive 공용 캐시)
+# ─────────────────────────────────────────────────────────
+
+class _SerializedHttp(AuthorizedHttp):
+    """
+    요청을 한 번에 하나씩만 보내는 AuthorizedHttp.
+    캐시된 서비스 객체를 스크립트 스레드와 백그라운드 발송/이력 스레드가 함께 써도
+    httplib2 연결이 섞이지 않게 한다.
+    """
+
+    def __init__(self, credentials: Credentials):
+        super().__init__(credentials, http=build_http())
+        self._lock = threading.RLock()
+
+    def request(self, *args, **kwargs):
+        with self._lock:
+            return super().request(*args, **kwargs)
+
+
+def credentials_key(credentials: Credentials) -> str:
+    """
+    사용자별 캐시 키. access token은 1시간마다 바뀌므로 refresh token 기준으로 만든다.
+    (비밀 값이 그대로 메모리 키에 남지 않도록 해시)
+    """
+    ident = f"{credentials.client_id}:{credentials.refresh_token or credentials.token}"
+    return hashlib.sha1(ident.encode("utf-8")).hexdigest()
+
+
+@st.cache_resource(show_spinner=False, max_entries=16, ttl=3600)
+def _shared_http(user_key: str, _credentials: Credentials) -> _SerializedHttp:
+    """
+    사용자별 공용 HTTP 클라이언트.
+    Gmail/Sheets/Drive 서비스가 같은 httplib2 연결 풀을 써서 TLS 연결을 재사용한다.
+    access token이 갱신돼도(자체적으로 refresh) 같은 연결을 계속 쓴다.
+    """
+    return _SerializedHttp(_credentials)
+
+
+@st.cache_resource(show_spinner=False)
+def _discovery_document(api: str, version: str) -> dict:
+    """
+    라이브러리에 포함된 discovery 문서를 프로세스당 한 번만 읽고 파싱한다.
+    네트워크로 받지 않으며, 서비스를 새로 만들 때마다 JSON 파일을 다시 파싱하지 않는다.
+    """
+    return json.loads(discovery_cache.get_static_doc(api, version))
+
+
+@st.cache_resource(show_spinner=False, max_entries=32, ttl=3600)
+def _cached_service(api: str, version: str, user_key: str, _credentials: Credentials):
+    """(API, 버전, 사용자)별로 서비스 객체를 한 번만 만든다."""
+    return build_from_document(
+        _discovery_document(api, version),
+        http=_shared_http(user_key, _credentials),
+    )
+
+
+def get_api_service(api: str, version: str, credentials: Credentials, cached: bool = True):
+    """
+    Google API 서비스 객체를 반환한다.
+    기본적으로 사용자별로 캐시된 객체(HTTP 클라이언트 포함)를 재사용하고,
+    cached=False면 연결을 새로 만들기 위해 항상 새 객체를 생성한다.
+    """
+    if not cached:
+        return build_from_document(_discovery_document(api, version), credentials=credentials)
+    return _cached_service(api, version, credentials_key(credentials), credentials)
+
+
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+# 속도 제한 사유 — 밑줄을 빼고 소문자로 비교한다
+# (errors 배열의 rateLimitExceeded와 details 배열의 RATE_LIMIT_EXCEEDED를 모두 맞추기 위해)
+RATE_LIMIT_REASONS = ("ratelimitexceeded", "userratelimitexceeded")
+
+
+def is_retryable_error(error: HttpError) -> bool:
+    """429/5xx 응답이면 True. (조회·Sheets 쓰기처럼 다시 보내도 되는 요청용)"""
+    return error.resp.status in RETRYABLE_STATUS
+
+
+def is_rate_limited(error: HttpError) -> bool:
+    """
+    요청이 처리되지 않고 속도 제한으로 거절됐으면 True.
+    (429, 또는 403 + rateLimitExceeded/userRateLimitExceeded/RATE_LIMIT_EXCEEDED)
+    """
+    if error.resp.status == 429:
+        return True
+    if error.resp.status != 403:
+        return False
+    details = error.error_details if isinstance(error.error_details, list) else []
+    return any(
+        isinstance(d, dict) and str(d.get("reason", "")).replace("_", "").lower() in RATE_LIMIT_REASONS
+        for d in details
+    )
+
+
+def execute_with_retry(
+    request,
+    max_attempts: int = 5,
+    base: float = 0.5,
+    cap: float = 30.0,
+    retry_if=is_retryable_error,
+):
+    """
+    API 요청을 실행하고, retry_if(오류)가 참이면(기본: 429/5xx) 지수 백오프 + 지터로 다시 시도한다.
+    서버가 Retry-After를 주면 그 시간만큼 기다린다. 그 밖의 오류는 바로 올린다.
+    """
+    for attempt in range(max_attempts):
+        try:
+            return request.execute()
+        except HttpError as e:
+            if not retry_if(e) or attempt == max_attempts - 1:
+                raise
+            retry_after = e.resp.get("retry-after", "")
+            if retry_after.isdigit():
+                delay = min(cap, float(retry_after))
+            else:
+                delay = min(cap, base * 2 ** attempt + random.uniform(0, base))
+            time.sleep(delay)
 
 
 # ─────────────────────────────────────────────────────────
 # Gmail API 메일 발송
 # ─────────────────────────────────────────────────────────
 
-def get_gmail_service(credentials: Credentials):
-    """Gmail API 서비스 객체를 생성한다."""
-    return build("gmail", "v1", credentials=credentials)
+def get_gmail_service(credentials: Credentials, cached: bool = True):
+    """Gmail API 서비스 객체를 반환한다. (get_api_service 참고)"""
+    return get_api_service("gmail", "v1", credentials, cached)
 
 
 def get_gmail_signature(service, email: str) -> str:
@@ -220,10 +377,10 @@ def get_gmail_signature(service, email: str) -> str:
         서명 HTML 문자열 (없으면 빈 문자열)
     """
     try:
-        result = service.users().settings().sendAs().get(
+        result = execute_with_retry(service.users().settings().sendAs().get(
             userId="me",
             sendAsEmail=email,
-        ).execute()
+        ))
         return result.get("signature", "")
     except HttpError:
         return ""
@@ -231,6 +388,113 @@ def get_gmail_signature(service, email: str) -> str:
         return ""
 
 
+def prepare_attachments(attachments: list | None) -> list[MIMEBase]:
+    """
+    첨부 파일을 base64 인코딩된 MIME 파트로 한 번만 만들어 둔다.
+    같은 파일을 여러 수신자에게 보낼 때 메일마다 다시 읽고 인코딩하지 않도록,
+    반환된 파트를 send_email(attachment_parts=...)에 그대로 넘긴다.
+    """
+    parts = []
+    for file in attachments or []:
+        file.seek(0)
+        file_data = file.read()
+        file_name = file.name
+
+        mime_type, _ = mimetypes.guess_type(file_name)
+        if mime_type is None:
+            mime_type = "application/octet-stream"
+        main_type, sub_type = mime_type.split("/", 1)
+
+        attachment = MIMEBase(main_type, sub_type)
+        # encoders.encode_base64와 같은 결과(76자 줄바꿈)를 payload 복사 없이 바로 만든다
+        attachment.set_payload(base64.encodebytes(file_data).decode("ascii"))
+        attachment["Content-Transfer-Encoding"] = "base64"
+        attachment.add_header(
+            "Content-Disposition",
+            "attachment",
+            filename=file_name,
+        )
+        parts.append(attachment)
+    return parts
+
+
+def _html_body(body: str, signature_html: str = "") -> str:
+    """메일 본문을 HTML로 바꾸고, 서명이 있으면 뒤에 붙인다."""
+    # HTML 본문 생성 (줄바꿈 → <br>)
+    html_body = body.replace("\n", "<br>")
+
+    # 서명이 있으면 본문 뒤에 추가
+    if signature_html:
+        html_body = (
+            f"{html_body}"
+            f'<br><br>'
+            f'<div style="padding-top: 8px; margin-top: 8px;">'
+            f'{signature_html}'
+            f'</div>'
+        )
+    return html_body
+
+
+def _build_raw_message(
+    to_email: str,
+    subject: str,
+    body: str,
+    from_email: str = "",
+    from_name: str = "",
+    signature_html: str = "",
+    attachments: list = None,
+) -> str:
+    """
+    발송할 메일을 MIME으로 만들어 Gmail API용 base64url 문자열로 반환한다.
+    attachments는 prepare_attachments()로 만든 MIME 파트 리스트.
+    """
+    html_body = _html_body(body, signature_html)
+
+    # 첨부파일이 있으면 mixed, 없으면 alternative
+    if attachments:
+        msg = MIMEMultipart("mixed")
+        msg_body = MIMEMultipart("alternative")
+    else:
+        msg = MIMEMultipart("alternative")
+        msg_body = msg
+
+    msg["To"] = to_email
+    # encoded-word처럼 보이는 글자(=?...?=)가 그대로 나가면 수신 측에서 디코딩되므로 통째로 인코딩
+    msg["Subject"] = Header(subject, "utf-8") if "=?" in subject else subject
+
+    if from_name and from_email:
+        # 한글 등 non-ASCII 이름을 RFC 2047로 인코딩
+        msg["From"] = formataddr((from_name, from_email))
+    elif from_email:
+        msg["From"] = from_email
+
+    # Plain text 버전
+    msg_body.attach(MIMEText(body, "plain", "utf-8"))
+    # HTML 버전 (서명 포함)
+    msg_body.attach(MIMEText(html_body, "html", "utf-8"))
+
+    # 첨부파일이 있으면 본문을 mixed에 넣고 파일 추가
+    if attachments:
+        msg.attach(msg_body)
+        for part in attachments:
+            msg.attach(part)
+
+    return base64.urlsafe_b64encode(msg.as_bytes()).decode("utf-8")
+
+
+def _describe_send_error(e: Exception) -> str:
+    """Gmail 발송 예외를 결과 메시지로 바꾼다."""
+    if isinstance(e, HttpError):
+        error_reason = e.reason if hasattr(e, "reason") else str(e)
+        if e.resp.status == 403:
+            return f"권한 오류: Gmail 발송 권한이 없습니다. ({error_reason})"
+        elif e.resp.status == 429:
+            return "발송 한도 초과: 잠시 후 다시 시도해주세요."
+        else:
+            return f"Gmail API 오류 ({e.resp.status}): {error_reason}"
+    return f"발송 오류: {e}"
+
+
 def send_email(
     service,
     to_email: str,
@@ -240,6 +504,7 @@ def send_email(
     from_name: str = "",
     signature_html: str = "",
     attachments: list = None,
+    attachment_parts: list = None,
 ) -> tuple[bool, str]:
     """
     Gmail API를 통해 이메일을 발송한다.
@@ -253,88 +518,28 @@ def send_email(
         from_name: 발신자 이름
         signature_html: Gmail 서명 HTML (비어있으면 서명 없이 발송)
         attachments: 첨부 파일 리스트 (Streamlit UploadedFile 객체)
+        attachment_parts: prepare_attachments()로 미리 만든 첨부 파트 (있으면 attachments 대신 사용)
 
     Returns:
         (성공 여부, 메시지)
     """
     try:
-        # 첨부파일이 있으면 mixed, 없으면 alternative
-        if attachments:
-            msg = MIMEMultipart("mixed")
-            msg_body = MIMEMultipart("alternative")
-        else:
-            msg = MIMEMultipart("alternative")
-            msg_body = msg
-
-        msg["To"] = to_email
-        msg["Subject"] = subject
-
-        if from_name and from_email:
-            # 한글 등 non-ASCII 이름을 RFC 2047로 인코딩
-            msg["From"] = formataddr((from_name, from_email))
-        elif from_email:
-            msg["From"] = from_email
-
-        # HTML 본문 생성 (줄바꿈 → <br>)
-        html_body = body.replace("\n", "<br>")
-
-        # 서명이 있으면 본문 뒤에 추가
-        if signature_html:
-            html_body = (
-                f"{html_body}"
-                f'<br><br>'
-                f'<div style="padding-top: 8px; margin-top: 8px;">'
-                f'{signature_html}'
-                f'</div>'
-            )
-
-        # Plain text 버전
-        msg_body.attach(MIMEText(body, "plain", "utf-8"))
-        # HTML 버전 (서명 포함)
-        msg_body.attach(MIMEText(html_body, "html", "utf-8"))
-
-        # 첨부파일이 있으면 본문을 mixed에 넣고 파일 추가
-        if attachments:
-            msg.attach(msg_body)
-            for file in attachments:
-                file.seek(0)
-                file_data = file.read()
-                file_name = file.name
-
-                mime_type, _ = mimetypes.guess_type(file_name)
-                if mime_type is None:
-                    mime_type = "application/octet-stream"
-                main_type, sub_type = mime_type.split("/", 1)
-
-                attachment = MIMEBase(main_type, sub_type)
-                attachment.set_payload(file_data)
-                encoders.encode_base64(attachment)
-                attachment.add_header(
-                    "Content-Disposition",
-                    "attachment",
-                    filename=file_name,
-                )
-                msg.attach(attachment)
-
-        raw = base64.urlsafe_b64encode(msg.as_bytes()).decode("utf-8")
-
-        result = service.users().messages().send(
+        if attachment_parts is None:
+            attachment_parts = prepare_attachments(attachments)
+        raw = _build_raw_message(
+            to_email, subject, body, from_email, from_name, signature_html, attachment_parts,
+        )
+
+        # 발송은 멱등이 아니다 — 5xx는 Gmail이 이미 받았을 수 있으므로 속도 제한 거절만 다시 시도한다
+        result = execute_with_retry(service.users().messages().send(
             userId="me",
             body={"raw": raw},
-        ).execute()
+        ), retry_if=is_rate_limited)
 
         return True, f"발송 성공 (ID: {result.get('id', '')})"
 
-    except HttpError as e:
-        error_reason = e.reason if hasattr(e, "reason") else str(e)
-        if e.resp.status == 403:
-            return False, f"권한 오류: Gmail 발송 권한이 없습니다. ({error_reason})"
-        elif e.resp.status == 429:
-            return False, "발송 한도 초과: 잠시 후 다시 시도해주세요."
-        else:
-            return False, f"Gmail API 오류 ({e.resp.status}): {error_reason}"
     except Exception as e:
-        return False, f"발송 오류: {e}"
+        return False, _describe_send_error(e)
 
 
 def check_secrets_configured() -> tuple[bool, str]:
@@ -10,52 +10,95 @@ from __future__ import annotations
 import logging
 from datetime import datetime, date
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from google_auth import credentials_key, execute_with_retry, get_api_service
+
 log = logging.getLogger(__name__)
 
 SPREADSHEET_TITLE = "콜드메일_발송이력"
 SHEET_NAME = "발송이력"
+# 발송이력 시트에 붙이는 Drive appProperties 표식 (이름이 바뀌어도 찾을 수 있게)
+HISTORY_APP_PROPERTY = ("coldmail_history", "v1")
 
+# 사용자별 발송이력 스프레드시트 ID (프로세스 전역 — 세션/백그라운드 스레드가 함께 사용)
+_SPREADSHEET_ID_CACHE: dict[str, str] = {}
 
 # ─────────────────────────────────────────────────────────
 # 내부 헬퍼
 # ─────────────────────────────────────────────────────────
 
 def _get_sheets_service(credentials: Credentials):
-    """Google Sheets API 서비스 객체를 생성한다."""
-    return build("sheets", "v4", credentials=credentials, cache_discovery=False)
+    """Google Sheets API 서비스 객체를 반환한다. (access token별 캐시)"""
+    return get_api_service("sheets", "v4", credentials)
 
 
 def _get_drive_service(credentials: Credentials):
-    """Google Drive API 서비스 객체를 생성한다."""
-    return build("drive", "v3", credentials=credentials, cache_discovery=False)
+    """Google Drive API 서비스 객체를 반환한다. (access token별 캐시)"""
+    return get_api_service("drive", "v3", credentials)
 
 
 def _find_spreadsheet(credentials: Credentials) -> str | None:
     """
     사용자의 Drive에서 기존 발송이력 스프레드시트를 찾는다.
+    앱이 붙여 둔 appProperties 표식으로 먼저 찾고, 표식이 없는 예전 시트는 이름으로 찾는다.
+    이름으로 찾은 시트는 하나뿐일 때만 표식을 붙인다. (여럿이면 가장 먼저 만든 시트를 쓰되 표식은 붙이지 않음)
 
     Returns:
         spreadsheet_id 또는 None
     """
     drive = _get_drive_service(credentials)
+    key, value = HISTORY_APP_PROPERTY
+    found = _query_spreadsheets(
+        drive, f"appProperties has {{ key='{key}' and value='{value}' }} and trashed = false",
+    )
+    if found:
+        return found[0]
+
+    # Drive 쿼리 문자열 안의 \ 와 ' 는 이스케이프해야 한다
+    safe_title = SPREADSHEET_TITLE.replace("\\", "\\\\").replace("'", "\\'")
     query = (
-        f"name = '{SPREADSHEET_TITLE}' "
+        f"name = '{safe_title}' "
         f"and mimeType = 'application/vnd.google-apps.spreadsheet' "
-        f"and trashed = false"
+        f"and trashed = false "
+        f"and 'me' in owners"
     )
-    result = drive.files().list(
+    # 사용자가 만든 사본 등 같은 이름이 여럿일 수 있으므로 2건까지 받아 확인한다
+    found = _query_spreadsheets(drive, query, limit=2)
+    if not found:
+        return None
+    if len(found) == 1:
+        _tag_spreadsheet(credentials, found[0])
+    return found[0]
+
+
+def _query_spreadsheets(drive, query: str, limit: int = 1) -> list[str]:
+    """Drive 쿼리에 맞는 파일 ID를 만든 순서대로 최대 limit개 반환한다."""
+    result = execute_with_retry(drive.files().list(
         q=query,
         spaces="drive",
-        fields="files(id, name)",
-        pageSize=1,
-    ).execute()
-    files = result.get("files", [])
-    if files:
-        return files[0]["id"]
-    return None
+        corpora="user",  # 공유 드라이브는 검색하지 않는다
+        orderBy="createdTime",
+        fields="files(id)",
+        pageSize=limit,
+    ))
+    return [f["id"] for f in result.get("files", [])]
+
+
+def _tag_spreadsheet(credentials: Credentials, spreadsheet_id: str) -> None:
+    """
+    스프레드시트에 appProperties 표식을 붙인다.
+    실패해도 이름 검색으로 다시 찾을 수 있으므로 기록만 남긴다.
+    """
+    key, value = HISTORY_APP_PROPERTY
+    try:
+        execute_with_retry(_get_drive_service(credentials).files().update(
+            fileId=spreadsheet_id,
+            body={"appProperties": {key: value}},
+            fields="id",
+        ))
+    except HttpError as e:
+        log.warning("발송이력 시트 표식 추가 실패 (Drive API %s)", e.resp.status)
 
 
 def _create_spreadsheet(credentials: Credentials) -> str:
@@ -72,26 +115,111 @@ def _create_spreadsheet(credentials: Credentials) -> str:
             "properties": {"title": SHEET_NAME},
         }],
     }
-    spreadsheet = sheets.spreadsheets().create(body=body).execute()
+    # 응답은 ID만 받는다 (기본 응답은 시트 속성 전체)
+    spreadsheet = execute_with_retry(sheets.spreadsheets().create(body=body, fields="spreadsheetId"))
     spreadsheet_id = spreadsheet["spreadsheetId"]
 
     # 헤더 행 추가
-    sheets.spreadsheets().values().update(
+    execute_with_retry(sheets.spreadsheets().values().update(
         spreadsheetId=spreadsheet_id,
         range=f"{SHEET_NAME}!A1:B1",
         valueInputOption="RAW",
         body={"values": [["이메일", "발송시각"]]},
-    ).execute()
+        fields="spreadsheetId",
+    ))
+    _tag_spreadsheet(credentials, spreadsheet_id)
 
     return spreadsheet_id
 
 
+def _cached_spreadsheet_id(credentials: Credentials) -> str | None:
+    """보관된 스프레드시트 ID. 없으면 None."""
+    return _SPREADSHEET_ID_CACHE.get(credentials_key(credentials))
+
+
+def _remember_spreadsheet_id(credentials: Credentials, spreadsheet_id: str | None) -> None:
+    """스프레드시트 ID를 보관한다. None이면 보관된 ID를 지운다."""
+    key = credentials_key(credentials)
+    if spreadsheet_id:
+        _SPREADSHEET_ID_CACHE[key] = spreadsheet_id
+    else:
+        _SPREADSHEET_ID_CACHE.pop(key, None)
+
+
 def _get_or_create_spreadsheet(credentials: Credentials) -> str:
-    """기존 스프레드시트를 찾거나, 없으면 새로 생성한다."""
-    spreadsheet_id = _find_spreadsheet(credentials)
+    """
+    기존 스프레드시트를 찾거나, 없으면 새로 생성한다.
+    한 번 찾은 ID는 사용자별로 보관해 이후 호출(백그라운드 스레드 포함)에서 Drive 검색을 생략한다.
+    """
+    spreadsheet_id = _cached_spreadsheet_id(credentials)
     if spreadsheet_id:
         return spreadsheet_id
-    return _create_spreadsheet(credentials)
+    spreadsheet_id = _find_spreadsheet(credentials) or _create_spreadsheet(credentials)
+    _remember_spreadsheet_id(credentials, spreadsheet_id)
+    return spreadsheet_id
+
+
+def _with_spreadsheet(credentials: Credentials, fn, session: SendHistorySession | None = None):
+    """
+    fn(spreadsheet_id)를 실행한다.
+    보관된 ID의 시트가 삭제되어 404가 나면 ID를 다시 찾아 한 번 더 시도한다.
+    session이 있으면 세션이 확인해 둔 ID를 쓴다.
+    """
+    if session is not None:
+        spreadsheet_id = session.spreadsheet_id
+    else:
+        spreadsheet_id = _get_or_create_spreadsheet(credentials)
+    try:
+        return fn(spreadsheet_id)
+    except HttpError as e:
+        if e.resp.status != 404:
+            raise
+        _remember_spreadsheet_id(credentials, None)
+        spreadsheet_id = _get_or_create_spreadsheet(credentials)
+        if session is not None:
+            session.spreadsheet_id = spreadsheet_id
+        return fn(spreadsheet_id)
+
+
+def _sheets_for(credentials: Credentials, session: SendHistorySession | None):
+    """세션이 있으면 세션의 Sheets 서비스를, 없으면 캐시된 서비스를 반환한다."""
+    return session.sheets if session is not None else _get_sheets_service(credentials)
+
+
+class SendHistorySession:
+    """
+    발송 작업 하나 동안 Sheets 서비스와 스프레드시트 ID를 한 번만 확인해 공유한다.
+
+    with SendHistorySession(creds) as history:
+        sent = history.sent_set()
+        ...
+        history.append(emails)
+    """
+
+    def __init__(self, credentials: Credentials):
+        self.credentials = credentials
+        self.sheets = None
+        self.spreadsheet_id: str | None = None
+
+    def open(self) -> SendHistorySession:
+        """서비스와 스프레드시트 ID를 확인한다. (with 없이 쓸 때 직접 호출)"""
+        self.sheets = _get_sheets_service(self.credentials)
+        self.spreadsheet_id = _get_or_create_spreadsheet(self.credentials)
+        return self
+
+    def __enter__(self) -> SendHistorySession:
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+    def sent_set(self) -> set[str]:
+        """발송된 이메일 주소 집합. (get_sent_emails와 동일)"""
+        return get_sent_emails(self.credentials, session=self)
+
+    def append(self, emails: list[str]) -> tuple[bool, str]:
+        """이메일들을 이력에 추가한다. (add_sent_emails_batch와 동일)"""
+        return add_sent_emails_batch(self.credentials, emails, session=self)
 
 
 # ─────────────────────────────────────────────────────────
@@ -109,7 +237,7 @@ def verify_sheets_access(credentials: Credentials) -> tuple[bool, str]:
     # 1. Drive API 확인
     try:
         drive = _get_drive_service(credentials)
-        drive.files().list(pageSize=1, fields="files(id)").execute()
+        execute_with_retry(drive.files().list(pageSize=1, fields="files(id)"))
     except HttpError as e:
         if e.resp.status == 403:
             return False, "Google Drive API가 활성화되지 않았습니다. Google Cloud Console → API 라이브러리에서 'Google Drive API'를 사용 설정해주세요."
@@ -123,13 +251,14 @@ def verify_sheets_access(credentials: Credentials) -> tuple[bool, str]:
         # 기존 스프레드시트가 있으면 읽기, 없으면 생성 시도
         spreadsheet_id = _find_spreadsheet(credentials)
         if spreadsheet_id:
-            sheets.spreadsheets().values().get(
+            execute_with_retry(sheets.spreadsheets().values().get(
                 spreadsheetId=spreadsheet_id,
                 range=f"{SHEET_NAME}!A1:A1",
-            ).execute()
+            ))
         else:
             # 새 스프레드시트 생성 시도
-            _create_spreadsheet(credentials)
+            spreadsheet_id = _create_spreadsheet(credentials)
+        _remember_spreadsheet_id(credentials, spreadsheet_id)
     except HttpError as e:
         if e.resp.status == 403:
             return False, "Google Sheets API가 활성화되지 않았습니다. Google Cloud Console → API 라이브러리에서 'Google Sheets API'를 사용 설정해주세요."
@@ -144,29 +273,73 @@ def verify_sheets_access(credentials: Credentials) -> tuple[bool, str]:
 # 공개 API — credentials를 인자로 받음
 # ─────────────────────────────────────────────────────────
 
-def get_sent_emails(credentials: Credentials) -> set[str]:
+def get_sent_emails(credentials: Credentials, session: SendHistorySession | None = None) -> set[str]:
     """
     발송된 이메일 주소 집합을 반환한다.
+    호출할 때마다 시트에서 읽는다 — 재사용은 호출하는 쪽(app.py의 세션 캐시)에서 한다.
 
     Args:
         credentials: Google OAuth Credentials 객체
+        session: 열려 있는 SendHistorySession (있으면 서비스/ID 조회 생략)
 
     Raises:
         HttpError: API 호출 실패 시
     """
-    spreadsheet_id = _get_or_create_spreadsheet(credentials)
-    sheets = _get_sheets_service(credentials)
-    result = sheets.spreadsheets().values().get(
-        spreadsheetId=spreadsheet_id,
-        range=f"{SHEET_NAME}!A:A",
-    ).execute()
-    values = result.get("values", [])
-    # 첫 행(헤더)은 제외, 소문자로 통일
-    emails = set()
-    for row in values[1:]:
-        if row:
-            emails.add(row[0].strip().lower())
-    return emails
+    sheets = _sheets_for(credentials, session)
+    # 열 단위(COLUMNS)로 받으면 셀마다 감싸는 리스트 없이 평평한 목록 하나로 온다 (헤더 제외)
+    result = _with_spreadsheet(
+        credentials,
+        lambda spreadsheet_id: execute_with_retry(sheets.spreadsheets().values().get(
+            spreadsheetId=spreadsheet_id,
+            range=f"{SHEET_NAME}!A2:A",
+            majorDimension="COLUMNS",
+            fields="values",
+        )),
+        session,
+    )
+    return _parse_emails(_first_column(result))
+
+
+def _first_column(value_range: dict) -> list[str]:
+    """majorDimension=COLUMNS로 받은 범위의 첫 열 값 목록. (비어 있으면 [])"""
+    columns = value_range.get("values")
+    return columns[0] if columns else []
+
+
+def _parse_emails(column: list[str]) -> set[str]:
+    """이메일 열 값 목록을 소문자 이메일 집합으로 바꾼다. (빈 셀 제외)"""
+    # 요소마다 바이트코드를 도는 대신 map/filter 체인을 C 수준의 set() 생성에 바로 넘긴다
+    return set(map(str.lower, map(str.strip, filter(None, column))))
+
+
+def fetch_history(
+    credentials: Credentials, session: SendHistorySession | None = None,
+) -> tuple[set[str], int]:
+    """
+    발송된 이메일 집합과 오늘 발송 건수를 values.batchGet 한 번으로 함께 가져온다.
+    로그인 직후처럼 둘 다 필요할 때 사용.
+
+    Returns:
+        (이메일 집합, 오늘 발송 건수)
+
+    Raises:
+        HttpError: API 호출 실패 시
+    """
+    sheets = _sheets_for(credentials, session)
+    result = _with_spreadsheet(
+        credentials,
+        lambda spreadsheet_id: execute_with_retry(sheets.spreadsheets().values().batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=[f"{SHEET_NAME}!A2:A", f"{SHEET_NAME}!B2:B"],
+            majorDimension="COLUMNS",
+            fields="valueRanges(values)",
+        )),
+        session,
+    )
+    email_range, time_range = result.get("valueRanges", [{}, {}])
+    today_str = date.today().isoformat()  # "YYYY-MM-DD"
+    today_count = sum(1 for v in _first_column(time_range) if v.startswith(today_str))
+    return _parse_emails(_first_column(email_range)), today_count
 
 
 def get_sent_count(credentials: Credentials) -> int:
@@ -174,51 +347,41 @@ def get_sent_count(credentials: Credentials) -> int:
     return len(get_sent_emails(credentials))
 
 
-def get_today_sent_count(credentials: Credentials) -> int:
-    """오늘 발송한 건수를 Google Sheets에서 계산하여 반환한다."""
-    try:
-        spreadsheet_id = _get_or_create_spreadsheet(credentials)
-        sheets = _get_sheets_service(credentials)
-        result = sheets.spreadsheets().values().get(
-            spreadsheetId=spreadsheet_id,
-            range=f"{SHEET_NAME}!A:B",
-        ).execute()
-        values = result.get("values", [])
-        today_str = date.today().isoformat()  # "YYYY-MM-DD"
-        count = 0
-        for row in values[1:]:  # 헤더 제외
-            if len(row) >= 2 and row[1].startswith(today_str):
-                count += 1
-        return count
-    except Exception:
-        return 0
-
-
-def add_sent_emails_batch(credentials: Credentials, emails: list[str]) -> tuple[bool, str]:
+def add_sent_emails_batch(
+    credentials: Credentials, emails: list[str], session: SendHistorySession | None = None,
+) -> tuple[bool, str]:
     """
     여러 이메일을 한꺼번에 이력에 추가한다.
 
     Args:
         credentials: Google OAuth Credentials 객체
         emails: 성공 발송된 이메일 주소 리스트
+        session: 열려 있는 SendHistorySession (있으면 서비스/ID 조회 생략)
 
     Returns:
         (성공 여부, 메시지)
     """
+    # 같은 호출 안의 중복 주소는 한 행만 쓴다 — 쓰기 한도 절약
+    emails = [email for email in dict.fromkeys(e.strip().lower() for e in emails if e) if email]
     if not emails:
         return True, ""
     try:
-        spreadsheet_id = _get_or_create_spreadsheet(credentials)
-        sheets = _get_sheets_service(credentials)
+        sheets = _sheets_for(credentials, session)
         now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        rows = [[email.strip().lower(), now] for email in emails]
-        sheets.spreadsheets().values().append(
-            spreadsheetId=spreadsheet_id,
-            range=f"{SHEET_NAME}!A:B",
-            valueInputOption="RAW",
-            insertDataOption="INSERT_ROWS",
-            body={"values": rows},
-        ).execute()
+        rows = [[email, now] for email in emails]
+        _with_spreadsheet(
+            credentials,
+            lambda spreadsheet_id: execute_with_retry(sheets.spreadsheets().values().append(
+                spreadsheetId=spreadsheet_id,
+                range=f"{SHEET_NAME}!A:B",
+                valueInputOption="RAW",
+                insertDataOption="INSERT_ROWS",
+                includeValuesInResponse=False,
+                body={"values": rows},
+                fields="updates/updatedRows",  # 응답은 추가된 행 수만 받는다
+            )),
+            session,
+        )
         return True, f"{len(emails)}건 이력 저장 완료"
     except HttpError as e:
         msg = f"이력 저장 실패 (Sheets API {e.resp.status}): {e.reason if hasattr(e, 'reason') else e}"
@@ -231,51 +394,30 @@ def add_sent_emails_batch(credentials: Credentials, emails: list[str]) -> tuple[
 
 
 def add_sent_email(credentials: Credentials, email: str) -> tuple[bool, str]:
-    """성공 발송된 이메일 1건을 이력에 추가한다."""
+    """
+    성공 발송된 이메일 1건을 이력에 추가한다.
+    여러 건을 기록할 때는 쓰기 한도(분당 60회)를 아끼도록 add_sent_emails_batch로 묶어 호출한다.
+    """
     return add_sent_emails_batch(credentials, [email])
 
 
 def clear_history(credentials: Credentials) -> None:
     """
-    발송 이력을 초기화한다 (시트 내용 삭제 후 헤더만 남김).
+    발송 이력을 초기화한다 (헤더만 남기고 이력 범위를 비움).
     """
-    spreadsheet_id = _find_spreadsheet(credentials)
+    spreadsheet_id = _cached_spreadsheet_id(credentials) or _find_spreadsheet(credentials)
     if not spreadsheet_id:
         return
+    _remember_spreadsheet_id(credentials, spreadsheet_id)
     sheets = _get_sheets_service(credentials)
 
-    # 시트 ID 가져오기
-    meta = sheets.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-    sheet_id = None
-    for sheet in meta.get("sheets", []):
-        if sheet["properties"]["title"] == SHEET_NAME:
-            sheet_id = sheet["properties"]["sheetId"]
-            break
-
-    if sheet_id is None:
-        return
-
-    # 2행부터 전부 삭제 (헤더 유지)
-    result = sheets.spreadsheets().values().get(
-        spreadsheetId=spreadsheet_id,
-        range=f"{SHEET_NAME}!A:A",
-    ).execute()
-    total_rows = len(result.get("values", []))
-
-    if total_rows <= 1:
-        return  # 헤더밖에 없음
-
-    requests = [{
-        "deleteDimension": {
-            "range": {
-                "sheetId": sheet_id,
-                "dimension": "ROWS",
-                "startIndex": 1,
-                "endIndex": total_rows,
-            }
-        }
-    }]
-    sheets.spreadsheets().batchUpdate(
-        spreadsheetId=spreadsheet_id,
-        body={"requests": requests},
-    ).execute()
+    # 2행부터 전부 비우기 (헤더 유지) — 행 수나 시트 ID를 미리 조회할 필요 없음
+    _with_spreadsheet(
+        credentials,
+        lambda spreadsheet_id: execute_with_retry(sheets.spreadsheets().values().clear(
+            spreadsheetId=spreadsheet_id,
+            range=f"{SHEET_NAME}!A2:B",
+            body={},
+            fields="spreadsheetId",
+        )),
+    )
@@ -6,7 +6,9 @@
 """
 
 import re
-from typing import Optional
+from collections.abc import Iterable
+from functools import lru_cache
+from typing import NamedTuple, Optional
 
 
 # {변수명} 패턴 매칭 정규식
@@ -23,16 +25,58 @@ def extract_variables(text: str) -> list[str]:
     Returns:
         고유한 변수명 리스트 (등장 순서 유지)
     """
-    found = VARIABLE_PATTERN.findall(text)
-    # 중복 제거하면서 순서 유지
-    seen = set()
-    result = []
-    for var in found:
-        var = var.strip()
-        if var and var not in seen:
-            seen.add(var)
-            result.append(var)
-    return result
+    # dict는 삽입 순서를 유지하므로 fromkeys로 중복 제거
+    return list(dict.fromkeys(filter(None, map(str.strip, VARIABLE_PATTERN.findall(text)))))
+
+
+class CompiledTemplate:
+    """
+    한 번 파싱한 템플릿. 변수 사이의 고정 문자열(statics)과 변수명(vars)을 번갈아 이어 붙여 렌더링한다.
+    len(statics) == len(vars) + 1
+    """
+
+    __slots__ = ("statics", "vars")
+
+    def __init__(self, statics: list[str], var_names: list[str]):
+        self.statics = statics
+        self.vars = var_names
+
+    def render(self, data: dict[str, str], defaults: Optional[dict[str, str]] = None) -> str:
+        """render_template과 같은 규칙(빈 값이면 기본값)으로 변수를 채운다."""
+        if defaults is None:
+            defaults = {}
+        statics = self.statics
+        out = [statics[0]]
+        for i, var in enumerate(self.vars, 1):
+            out.append(data.get(var, "") or defaults.get(var, ""))
+            out.append(statics[i])
+        return "".join(out)
+
+    def render_resolved(self, values: dict[str, str]) -> str:
+        """기본값까지 이미 반영된 {변수명: 값}으로 채운다. (모든 변수가 values에 있어야 함)"""
+        statics = self.statics
+        out = [statics[0]]
+        for i, var in enumerate(self.vars, 1):
+            out.append(values[var])
+            out.append(statics[i])
+        return "".join(out)
+
+
+@lru_cache(maxsize=64)
+def compile_template(template: str) -> CompiledTemplate:
+    """
+    템플릿을 정규식으로 한 번만 훑어 CompiledTemplate으로 만든다.
+    같은 템플릿 문자열은 캐시되므로, 메일 머지 중 수신자마다 다시 파싱하지 않는다.
+    """
+    statics: list[str] = []
+    var_names: list[str] = []
+    last = 0
+    for match in VARIABLE_PATTERN.finditer(template):
+        statics.append(template[last:match.start()])
+        var_names.append(match.group(1).strip())
+        last = match.end()
+    statics.append(template[last:])
+    return CompiledTemplate(statics, var_names)
 
 
 def render_template(
@@ -51,20 +95,20 @@ def render_template(
     Returns:
         변수가 치환된 텍스트
     """
-    if defaults is None:
-        defaults = {}
+    return compile_template(template).render(data, defaults)
 
-    def replacer(match):
-        var_name = match.group(1).strip()
-        value = data.get(var_name, "")
 
-        # 값이 비어있으면 기본값 사용
-        if not value:
-            value = defaults.get(var_name, "")
+class RenderedEmail(NamedTuple):
+    """render_email 결과. 예전 dict 형태처럼 r["subject"]로도 읽을 수 있다."""
 
-        return value
+    subject: str
+    body: str
+    used_alt: bool
 
-    return VARIABLE_PATTERN.sub(replacer, template)
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return getattr(self, key)
+        return tuple.__getitem__(self, key)
 
 
 def render_email(
@@ -74,7 +118,7 @@ def render_email(
     defaults: Optional[dict[str, str]] = None,
     alt_subject_template: Optional[str] = None,
     alt_body_template: Optional[str] = None,
-) -> dict[str, str]:
+) -> RenderedEmail:
     """
     한 수신자에 대해 최종 이메일 제목/본문을 생성한다.
 
@@ -89,27 +133,65 @@ def render_email(
         alt_body_template: 빈 값 행용 대체 본문 템플릿
 
     Returns:
-        {"subject": 최종 제목, "body": 최종 본문, "used_alt": 대체 템플릿 사용 여부}
+        RenderedEmail(subject=최종 제목, body=최종 본문, used_alt=대체 템플릿 사용 여부)
     """
-    if defaults is None:
-        defaults = {}
+    return render_email_batch(
+        subject_template, body_template, [data], defaults,
+        alt_subject_template, alt_body_template,
+    )[0]
 
-    # 사용된 변수 추출
-    all_vars = set(extract_variables(subject_template) + extract_variables(body_template))
 
-    # 빈 값이 있는지 확인
-    has_empty = any(not data.get(v, "") for v in all_vars if v in data or v in defaults)
+def render_email_batch(
+    subject_template: str,
+    body_template: str,
+    rows: Iterable[dict[str, str]],
+    defaults: Optional[dict[str, str]] = None,
+    alt_subject_template: Optional[str] = None,
+    alt_body_template: Optional[str] = None,
+) -> list[RenderedEmail]:
+    """
+    여러 수신자에 대해 render_email을 한 번에 수행한다. (결과는 행마다 render_email을 부른 것과 같다)
+    템플릿 파싱과 대체 템플릿 판단용 변수 목록은 한 번만 준비하고, 행마다 치환만 한다.
 
-    # 빈 값이 있고 별도 템플릿이 있으면 대체 템플릿 사용
-    if has_empty and alt_subject_template and alt_body_template:
-        subject = render_template(alt_subject_template, data, defaults)
-        body = render_template(alt_body_template, data, defaults)
-        return {"subject": subject, "body": body, "used_alt": True}
+    Args:
+        rows: 행별 {변수명: 값} 딕셔너리 (예: excel_parser.get_records 결과)
+        나머지는 render_email과 같음
+
+    Returns:
+        행 순서대로의 RenderedEmail 리스트
+    """
+    if defaults is None:
+        defaults = {}
 
-    # 기본 템플릿 사용
-    subject = render_template(subject_template, data, defaults)
-    body = render_template(body_template, data, defaults)
-    return {"subject": subject, "body": body, "used_alt": False}
+    # 사용된 변수 (템플릿은 캐시된 파싱 결과를 쓰므로 수신자마다 다시 훑지 않음)
+    subject_c = compile_template(subject_template)
+    body_c = compile_template(body_template)
+    all_vars = list(dict.fromkeys(subject_c.vars + body_c.vars))
+    check_vars = [v for v in all_vars if v]
+
+    use_alt = bool(alt_subject_template and alt_body_template)
+    if use_alt:
+        alt_subject_c = compile_template(alt_subject_template)
+        alt_body_c = compile_template(alt_body_template)
+
+    results = []
+    for data in rows:
+        # 빈 값이 있는지 확인
+        has_empty = any(not data.get(v, "") for v in check_vars if v in data or v in defaults)
+
+        # 빈 값이 있고 별도 템플릿이 있으면 대체 템플릿 사용
+        if has_empty and use_alt:
+            results.append(RenderedEmail(
+                alt_subject_c.render(data, defaults), alt_body_c.render(data, defaults), True,
+            ))
+            continue
+
+        # 기본 템플릿 사용 — 변수 값은 한 번만 결정해 제목/본문에 함께 쓴다
+        resolved = {v: data.get(v, "") or defaults.get(v, "") for v in all_vars}
+        results.append(RenderedEmail(
+            subject_c.render_resolved(resolved), body_c.render_resolved(resolved), False,
+        ))
+    return results
 
 
 def get_empty_variables(data: dict[str, str], variables: list[str]) -> list[str]:
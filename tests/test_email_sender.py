@@ -0,0 +1,87 @@
+"""email_sender: 대량 발송의 연결 재사용과 재시도 규칙을 가짜 SMTP 연결로 확인한다."""
+
+import smtplib
+
+import pytest
+
+import email_sender
+
+
+class FakeSMTP:
+    """send_message에서 정해 둔 오류를 차례로 내는 가짜 SMTP 연결."""
+
+    errors: list = []
+    sends = 0
+    connections: list = []
+
+    def __init__(self):
+        self.closed = False
+        FakeSMTP.connections.append(self)
+
+    def quit(self):
+        self.closed = True
+
+    def send_message(self, msg):
+        FakeSMTP.sends += 1
+        if FakeSMTP.errors:
+            raise FakeSMTP.errors.pop(0)
+
+
+@pytest.fixture(autouse=True)
+def fake_smtp(monkeypatch):
+    FakeSMTP.errors, FakeSMTP.sends, FakeSMTP.connections = [], 0, []
+    monkeypatch.setattr(email_sender, "_connect_smtp", lambda *args, **kwargs: FakeSMTP())
+    monkeypatch.setattr(email_sender, "backoff_delay", lambda *args, **kwargs: 0)
+
+
+def _send(count=1):
+    emails = [{"to": f"to{i}@x.com", "subject": "제목", "body": "본문"} for i in range(count)]
+    return email_sender.send_bulk_emails("me@x.com", "abcd efgh", "보내는 사람", emails, delay_seconds=0)
+
+
+def test_one_connection_per_run_and_closed_at_end():
+    assert all(r["success"] for r in _send(3))
+    assert len(FakeSMTP.connections) == 1
+    assert FakeSMTP.connections[0].closed
+
+
+def test_disconnect_during_send_is_not_retried_and_next_mail_reconnects():
+    FakeSMTP.errors = [smtplib.SMTPServerDisconnected("gone")]
+    first, second = _send(2)
+    assert not first["success"] and "발송 여부 확인" in first["message"]
+    assert second["success"]
+    assert FakeSMTP.sends == 2
+    assert len(FakeSMTP.connections) == 2
+
+
+def test_temporary_smtp_reply_is_retried():
+    FakeSMTP.errors = [smtplib.SMTPDataError(451, b"try later")] * 3
+    assert not _send()[0]["success"]
+    assert FakeSMTP.sends == 3
+
+
+def test_421_reply_is_retried_on_a_new_connection():
+    FakeSMTP.errors = [smtplib.SMTPDataError(421, b"closing")]
+    assert _send()[0]["success"]
+    assert FakeSMTP.sends == 2
+    assert len(FakeSMTP.connections) == 2
+    assert FakeSMTP.connections[0].closed
+
+
+def test_messages_are_built_before_connecting_and_a_bad_row_fails_alone(monkeypatch):
+    built = []
+    original = email_sender._build_message
+
+    def build(*args, **kwargs):
+        assert not FakeSMTP.connections  # 연결 전에 모두 만든다
+        built.append(args[2])
+        if args[2] == "bad@x.com":
+            raise ValueError("broken header")
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(email_sender, "_build_message", build)
+    emails = [{"to": to, "subject": "제목", "body": "본문"} for to in ("a@x.com", "bad@x.com", "c@x.com")]
+    results = email_sender.send_bulk_emails("me@x.com", "pw", "", emails, delay_seconds=0)
+    assert built == ["a@x.com", "bad@x.com", "c@x.com"]
+    assert [r["success"] for r in results] == [True, False, True]
+    assert FakeSMTP.sends == 2
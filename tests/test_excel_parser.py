@@ -0,0 +1,125 @@
+"""excel_parser: 엑셀 읽기와, 벡터화한 분석/정리 함수가 행 단위 기준 구현과 같은 결과를 내는지 확인한다."""
+
+import io
+import random
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import pytest
+
+from excel_parser import analyze_data, get_records, get_row_data, read_excel
+
+
+# ── 기준 구현 (변경 전 iterrows 기반 analyze_data) ──
+
+def _reference_analyze(df, used_variables, email_column):
+    no_email = complete = has_empty = 0
+    empty_details = []
+    check_columns = [v for v in used_variables if v in df.columns]
+    for idx, row in df.iterrows():
+        email = str(row.get(email_column, "")).strip()
+        if not email or email == "nan":
+            no_email += 1
+            continue
+        empty_vars = [
+            col for col in check_columns
+            if pd.isna(row.get(col, "")) or str(row.get(col, "")).strip() == ""
+        ]
+        if empty_vars:
+            has_empty += 1
+            empty_details.append({"row": idx + 2, "email": email, "empty_vars": empty_vars})
+        else:
+            complete += 1
+    return {
+        "total": len(df),
+        "complete": complete,
+        "has_empty": has_empty,
+        "no_email": no_email,
+        "empty_details": empty_details,
+    }
+
+
+# read_excel은 빈 셀을 NaN으로 읽으므로 None은 넣지 않는다
+VALUES = ["a", " ", "", np.nan, "nan", 3, 1.5, " x ", "김철수"]
+EMAILS = ["a@x.com", " b@x.com ", "", np.nan, "nan", "  ", "C@X.com"]
+
+
+def _random_frame(rng):
+    n = rng.randint(0, 8)
+    return pd.DataFrame({
+        "이메일": [rng.choice(EMAILS) for _ in range(n)],
+        "회사명": [rng.choice(VALUES) for _ in range(n)],
+        "담당자": [rng.choice(VALUES) for _ in range(n)],
+        "메모": [rng.choice(VALUES) for _ in range(n)],
+    })
+
+
+def _random_cases(seed, count):
+    rng = random.Random(seed)
+    for _ in range(count):
+        used = rng.sample(["회사명", "담당자", "메모", "없는열"], rng.randint(0, 4))
+        email_column = rng.choice(["이메일", "이메일", "회사명", "없는열"])
+        yield _random_frame(rng), used, email_column
+
+
+@pytest.mark.parametrize("case", list(_random_cases(seed=1, count=300)))
+def test_analyze_data_matches_reference(case):
+    df, used, email_column = case
+    assert analyze_data(df, used, email_column) == _reference_analyze(df, used, email_column)
+
+
+def test_analyze_data_counts():
+    df = pd.DataFrame({
+        "이메일": ["a@x.com", "", "b@x.com", np.nan],
+        "회사명": ["삼성", "LG", " ", "SK"],
+    })
+    result = analyze_data(df, ["회사명"], "이메일")
+    assert result == {
+        "total": 4,
+        "complete": 1,
+        "has_empty": 1,
+        "no_email": 2,
+        "empty_details": [{"row": 4, "email": "b@x.com", "empty_vars": ["회사명"]}],
+    }
+
+
+def test_analyze_data_without_variable_columns_only_counts_emails():
+    df = pd.DataFrame({"이메일": ["a@x.com", "nan", " "]})
+    result = analyze_data(df, ["없는열"], "이메일")
+    assert (result["complete"], result["has_empty"], result["no_email"]) == (1, 0, 2)
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_get_records_matches_get_row_data(seed):
+    df = _random_frame(random.Random(seed))
+    assert get_records(df) == [get_row_data(df, i) for i in range(len(df))]
+
+
+def test_get_records_cleans_values():
+    df = pd.DataFrame({"이메일": [" a@x.com ", np.nan], "번호": [3, 1.5]})
+    assert get_records(df) == [
+        {"이메일": "a@x.com", "번호": "3.0"},
+        {"이메일": "", "번호": "1.5"},
+    ]
+
+
+# ── 엑셀 읽기 ──
+
+def test_read_excel_keeps_text_that_looks_like_an_error_code():
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["이메일", "메모"])
+    ws.append(["a@x.com", None])
+    ws.append(["b@x.com", None])
+    ws["B2"].value = "#DIV/0!"
+    ws["B2"].data_type = "s"   # 글자로 입력한 셀
+    ws["B3"] = "#DIV/0!"       # openpyxl은 오류 코드 문자열을 오류 셀로 저장한다
+    assert ws["B3"].data_type == "e"
+    buf = io.BytesIO()
+    wb.save(buf)
+    buf.seek(0)
+
+    df = read_excel(buf)
+    assert df.loc[0, "메모"] == "#DIV/0!"
+    assert pd.isna(df.loc[1, "메모"])
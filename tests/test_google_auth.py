@@ -0,0 +1,127 @@
+"""google_auth: 요청 재시도 규칙과 발송 메일 구성을 확인한다."""
+
+import base64
+import email
+import io
+import json
+from email import policy
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+import google_auth
+
+
+def _http_error(status, reason="backendError"):
+    content = json.dumps({"error": {"code": status, "message": "m", "errors": [{"reason": reason}]}})
+    return HttpError(httplib2.Response({"status": status}), content.encode())
+
+
+def _http_error_with_details(status, reason):
+    """Google RPC 형식(details 배열) 오류. googleapiclient는 이때 error_details를 details로 채운다."""
+    content = json.dumps({"error": {
+        "code": status,
+        "message": "m",
+        "errors": [{"reason": "rateLimitExceeded" if reason == "RATE_LIMIT_EXCEEDED" else "forbidden"}],
+        "status": "PERMISSION_DENIED",
+        "details": [{
+            "@type": "type.googleapis.com/google.rpc.ErrorInfo",
+            "reason": reason,
+            "domain": "googleapis.com",
+        }],
+    }})
+    return HttpError(httplib2.Response({"status": status}), content.encode())
+
+
+class _FailingRequest:
+    def __init__(self, error, failures=99):
+        self.error, self.failures, self.attempts = error, failures, 0
+
+    def execute(self):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise self.error
+        return {"id": "ok"}
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(google_auth.time, "sleep", lambda seconds: None)
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_default_retries_transient_errors(status):
+    request = _FailingRequest(_http_error(status), failures=2)
+    assert google_auth.execute_with_retry(request) == {"id": "ok"}
+    assert request.attempts == 3
+
+
+def test_default_does_not_retry_client_errors():
+    request = _FailingRequest(_http_error(400))
+    with pytest.raises(HttpError):
+        google_auth.execute_with_retry(request)
+    assert request.attempts == 1
+
+
+@pytest.mark.parametrize("error, retried", [
+    (_http_error(429), True),
+    (_http_error(403, "userRateLimitExceeded"), True),
+    (_http_error(403, "rateLimitExceeded"), True),
+    (_http_error(403, "forbidden"), False),
+    (_http_error_with_details(403, "RATE_LIMIT_EXCEEDED"), True),
+    (_http_error_with_details(403, "ACCESS_TOKEN_SCOPE_INSUFFICIENT"), False),
+    (_http_error(500), False),   # 발송은 5xx를 다시 보내지 않는다 (이미 접수됐을 수 있음)
+    (_http_error(503), False),
+])
+def test_send_retries_only_rate_limits(error, retried):
+    request = _FailingRequest(error)
+    with pytest.raises(HttpError):
+        google_auth.execute_with_retry(request, max_attempts=3, retry_if=google_auth.is_rate_limited)
+    assert request.attempts == (3 if retried else 1)
+
+
+# ── 발송 메일 구성 ──
+
+def _parse_raw(raw):
+    return email.message_from_bytes(base64.urlsafe_b64decode(raw), policy=policy.default)
+
+
+def _upload(name, data):
+    f = io.BytesIO(data)
+    f.name = name
+    return f
+
+
+@pytest.mark.parametrize("subject", [
+    "삼성전자 협업 제안드립니다 - ABC컴퍼니",
+    "Partnership proposal " * 20,          # 접어야 하는 긴 ASCII 제목
+    "literal =?utf-8?b?6rmA?= text",        # encoded-word처럼 보이는 글자
+])
+def test_build_raw_message_headers_round_trip(subject):
+    raw = google_auth._build_raw_message(
+        "to@example.com", subject, "본문", "me@example.com", "홍길동", "<b>서명</b>",
+    )
+    msg = _parse_raw(raw)
+    assert msg["Subject"] == subject
+    assert msg["To"] == "to@example.com"
+    assert msg["From"].addresses[0].display_name == "홍길동"
+    assert msg["From"].addresses[0].addr_spec == "me@example.com"
+    assert all(len(line) <= 998 for line in base64.urlsafe_b64decode(raw).splitlines())
+
+
+def test_build_raw_message_parts_with_signature_and_attachments():
+    parts = google_auth.prepare_attachments([_upload("제안서.pdf", b"%PDF" * 100), _upload("a.bin", b"\x00\x01")])
+    raw = google_auth._build_raw_message(
+        "to@example.com", "제목", "안녕하세요\n김 대리님", "me@example.com", "", "<b>서명</b>", parts,
+    )
+    msg = _parse_raw(raw)
+    assert msg.get_content_type() == "multipart/mixed"
+    assert msg.get_body(("plain",)).get_content() == "안녕하세요\n김 대리님"
+    html = msg.get_body(("html",)).get_content()
+    assert html.startswith("안녕하세요<br>김 대리님") and "<b>서명</b>" in html
+    attachments = list(msg.iter_attachments())
+    assert [a.get_filename() for a in attachments] == ["제안서.pdf", "a.bin"]
+    assert attachments[0].get_content_type() == "application/pdf"
+    assert attachments[0].get_content() == b"%PDF" * 100
+    assert attachments[1].get_content() == b"\x00\x01"
@@ -0,0 +1,153 @@
+"""send_history: 가짜 Sheets/Drive 서비스로 발송 이력 조회·기록과 시트 찾기를 확인한다."""
+
+import pytest
+from google.oauth2.credentials import Credentials
+
+import send_history
+
+
+class _Request:
+    """googleapiclient 요청처럼 execute()만 제공한다."""
+
+    def __init__(self, google, name, fn):
+        self._google, self._name, self._fn = google, name, fn
+
+    def execute(self):
+        self._google.calls.append(self._name)
+        return self._fn()
+
+
+class FakeGoogle:
+    """발송이력 시트 하나를 흉내 내는 Sheets 서비스."""
+
+    def __init__(self, emails=()):
+        self.column = list(emails)   # A2:A
+        self.appended = []           # append 호출마다 받은 행 목록
+        self.calls = []
+
+    def edit(self, column):
+        """다른 프로세스/사용자가 시트를 고친 것처럼 값을 바꾼다."""
+        self.column = list(column)
+
+    # Sheets
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def get(self, **kwargs):
+        return _Request(self, "values.get", lambda: {"values": [list(self.column)]} if self.column else {})
+
+    def append(self, body, **kwargs):
+        def run():
+            rows = body["values"]
+            self.appended.append(rows)
+            self.edit(self.column + [row[0] for row in rows])
+            return {"updates": {"updatedRows": len(rows)}}
+        return _Request(self, "values.append", run)
+
+    def clear(self, **kwargs):
+        return _Request(self, "values.clear", lambda: self.edit([]) or {})
+
+
+@pytest.fixture
+def credentials():
+    return Credentials(token="token", refresh_token="refresh", client_id="client")
+
+
+@pytest.fixture
+def google(monkeypatch, credentials):
+    fake = FakeGoogle(["a@x.com", " B@X.com "])
+    monkeypatch.setattr(send_history, "_get_sheets_service", lambda creds: fake)
+    monkeypatch.setattr(send_history, "_SPREADSHEET_ID_CACHE", {})
+    send_history._remember_spreadsheet_id(credentials, "sheet-1")
+    return fake
+
+
+# ── 발송 이메일 조회 ──
+
+def test_get_sent_emails_normalizes_column(google, credentials):
+    assert send_history.get_sent_emails(credentials) == {"a@x.com", "b@x.com"}
+
+
+def test_get_sent_emails_reads_the_sheet_each_call(google, credentials):
+    # 캐시는 app.py 세션 캐시 한 곳에서만 한다 — 모듈은 Drive 조회 없이 시트만 읽는다
+    send_history.get_sent_emails(credentials)
+    google.edit(["c@x.com"])
+    assert send_history.get_sent_emails(credentials) == {"c@x.com"}
+    assert google.calls == ["values.get", "values.get"]
+
+
+def test_clear_history_empties_the_column(google, credentials):
+    send_history.clear_history(credentials)
+    assert send_history.get_sent_emails(credentials) == set()
+
+
+# ── 이력 기록 ──
+
+def test_add_sent_emails_batch_dedups_within_call(google, credentials):
+    ok, _ = send_history.add_sent_emails_batch(
+        credentials, [" New@x.com", "new@x.com", "", "other@x.com"],
+    )
+    assert ok
+    assert [row[0] for row in google.appended[0]] == ["new@x.com", "other@x.com"]
+
+
+def test_add_sent_emails_batch_does_not_filter_against_history(google, credentials):
+    # 이미 있는 주소도 기록한다 — 호출하는 쪽의 집합이 오래됐을 수 있으므로 이력은 빠뜨리지 않는다
+    send_history.add_sent_emails_batch(credentials, ["a@x.com"])
+    assert [row[0] for row in google.appended[0]] == ["a@x.com"]
+
+
+def test_add_sent_emails_batch_with_nothing_to_write_skips_api(google, credentials):
+    assert send_history.add_sent_emails_batch(credentials, ["", ""]) == (True, "")
+    assert google.calls == []
+
+
+# ── 스프레드시트 찾기 ──
+
+class FakeDrive:
+    """appProperties 표식 검색과 이름 검색에 각각 정해 둔 파일 ID를 돌려준다."""
+
+    def __init__(self, marked=(), named=()):
+        self.marked, self.named = list(marked), list(named)
+        self.lists, self.tagged, self.calls = [], [], []
+
+    def files(self):
+        return self
+
+    def list(self, q, orderBy, pageSize, **kwargs):
+        self.lists.append((orderBy, pageSize))
+        ids = self.marked if "appProperties" in q else self.named
+        return _Request(self, "files.list", lambda: {"files": [{"id": i} for i in ids[:pageSize]]})
+
+    def update(self, fileId, body, **kwargs):
+        self.tagged.append((fileId, body["appProperties"]))
+        return _Request(self, "files.update", dict)
+
+
+@pytest.fixture
+def drive(monkeypatch):
+    fake = FakeDrive()
+    monkeypatch.setattr(send_history, "_get_drive_service", lambda creds: fake)
+    return fake
+
+
+def test_find_prefers_marked_spreadsheet(drive):
+    drive.marked, drive.named = ["marked"], ["named"]
+    assert send_history._find_spreadsheet(None) == "marked"
+    assert drive.tagged == []
+
+
+def test_find_tags_a_unique_name_match(drive):
+    drive.named = ["only"]
+    assert send_history._find_spreadsheet(None) == "only"
+    assert drive.tagged == [("only", {"coldmail_history": "v1"})]
+
+
+def test_find_does_not_tag_when_several_names_match(drive):
+    drive.named = ["oldest", "copy"]
+    assert send_history._find_spreadsheet(None) == "oldest"
+    assert drive.tagged == []
+    assert all(order == "createdTime" for order, _ in drive.lists)
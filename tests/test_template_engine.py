@@ -0,0 +1,107 @@
+"""template_engine: 컴파일된 렌더링이 정규식 치환(기준 구현)과 같은 결과를 내는지 확인한다."""
+
+import random
+
+import pytest
+
+from template_engine import (
+    VARIABLE_PATTERN,
+    RenderedEmail,
+    compile_template,
+    extract_variables,
+    render_email,
+    render_email_batch,
+    render_template,
+)
+
+
+# ── 기준 구현 (변경 전 render_template / render_email) ──
+
+def _reference_render(template, data, defaults=None):
+    defaults = defaults or {}
+
+    def replacer(match):
+        name = match.group(1).strip()
+        return data.get(name, "") or defaults.get(name, "")
+
+    return VARIABLE_PATTERN.sub(replacer, template)
+
+
+def _reference_email(subject_t, body_t, data, defaults=None, alt_subject=None, alt_body=None):
+    defaults = defaults or {}
+    all_vars = set(extract_variables(subject_t) + extract_variables(body_t))
+    has_empty = any(not data.get(v, "") for v in all_vars if v in data or v in defaults)
+    if has_empty and alt_subject and alt_body:
+        return (_reference_render(alt_subject, data, defaults),
+                _reference_render(alt_body, data, defaults), True)
+    return (_reference_render(subject_t, data, defaults),
+            _reference_render(body_t, data, defaults), False)
+
+
+PIECES = ["안녕 ", "{", "}", "{{", "}}", "\n", "{회사명}", "{ 담당자 }", "{a.b}", "{0}",
+          "{x:y}", "{ }", "{e}", "{{e}}", "text", "{없음}"]
+NAMES = ["회사명", "담당자", "a.b", "0", "x:y", "e"]
+
+
+def _random_cases(seed, count):
+    rng = random.Random(seed)
+    for _ in range(count):
+        subject = "".join(rng.choice(PIECES) for _ in range(rng.randint(0, 8)))
+        body = "".join(rng.choice(PIECES) for _ in range(rng.randint(0, 12)))
+        rows = [
+            {n: rng.choice(["", "값", "v{1}"]) for n in NAMES if rng.random() < 0.7}
+            for _ in range(rng.randint(0, 5))
+        ]
+        defaults = rng.choice([None, {n: rng.choice(["", "기본"]) for n in NAMES if rng.random() < 0.5}])
+        alt = rng.choice([(None, None), ("ALT {회사명}", "대체 {담당자}"), ("A", "")])
+        yield subject, body, rows, defaults, alt
+
+
+def test_compile_template_splits_statics_and_vars():
+    compiled = compile_template("Hi {이름}, {{x}} { 회사 }!")
+    assert compiled.vars == ["이름", "x", "회사"]
+    assert compiled.statics == ["Hi ", ", {", "} ", "!"]
+    assert len(compiled.statics) == len(compiled.vars) + 1
+
+
+def test_compile_template_is_cached():
+    assert compile_template("{a} and {b}") is compile_template("{a} and {b}")
+
+
+@pytest.mark.parametrize("case", list(_random_cases(seed=1, count=300)))
+def test_render_template_matches_reference(case):
+    subject, body, rows, defaults, _ = case
+    for data in rows or [{}]:
+        assert render_template(subject, data, defaults) == _reference_render(subject, data, defaults)
+        assert render_template(body, data, defaults) == _reference_render(body, data, defaults)
+
+
+@pytest.mark.parametrize("case", list(_random_cases(seed=2, count=300)))
+def test_render_email_batch_matches_reference(case):
+    subject, body, rows, defaults, (alt_subject, alt_body) = case
+    batch = render_email_batch(subject, body, rows, defaults, alt_subject, alt_body)
+    assert len(batch) == len(rows)
+    for data, rendered in zip(rows, batch):
+        expected = _reference_email(subject, body, data, defaults, alt_subject, alt_body)
+        assert tuple(rendered) == expected
+        assert render_email(subject, body, data, defaults, alt_subject, alt_body) == rendered
+
+
+def test_render_email_uses_alt_template_only_when_a_value_is_empty():
+    kwargs = dict(alt_subject_template="안녕하세요", alt_body_template="대체 본문")
+    filled = render_email("{회사명} 제안", "{담당자}님", {"회사명": "삼성", "담당자": "김"}, **kwargs)
+    empty = render_email("{회사명} 제안", "{담당자}님", {"회사명": "삼성", "담당자": ""}, **kwargs)
+    assert filled == RenderedEmail("삼성 제안", "김님", False)
+    assert empty == RenderedEmail("안녕하세요", "대체 본문", True)
+
+
+def test_rendered_email_supports_dict_style_access():
+    rendered = render_email("{a}", "본문", {"a": "A"})
+    assert rendered["subject"] == rendered.subject == rendered[0] == "A"
+    assert rendered["body"] == "본문"
+    assert rendered["used_alt"] is False
+
+
+def test_extract_variables_dedups_in_order():
+    assert extract_variables("{b} {a} { b } {} { } {c}") == ["b", "a", "c"]
+